@@ -0,0 +1,205 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import struct
+import asyncio
+import logging
+import multiprocessing
+
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+
+# -------------------
+# Third party imports
+# -------------------
+
+from lica.asyncio.photometer import Role, Model
+from lica.asyncio.photometer.builder import PhotometerBuilder
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+# Ring header: total number of records ever written by the producer
+HEADER = struct.Struct("<Q")
+# Fixed size reading record: tstamp (POSIX), seq, freq, mag, tamb, tsky
+RECORD = struct.Struct("<dqdddd")
+
+RING_CAPACITY = 4096
+# Consumer polling period when the ring is empty [s]
+POLL_PERIOD = 0.02
+# Producer queue wait, so that the stop event is checked regularly [s]
+QUEUE_TIMEOUT = 0.25
+JOIN_TIMEOUT = 5
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------
+# Classes
+# -------
+
+
+class SharedRing:
+    """Single producer, single consumer ring of fixed size reading records
+    in a multiprocessing.shared_memory block. The producer only advances the
+    write counter in the header after the record is written. A lagging consumer
+    loses the oldest records instead of blocking the producer."""
+
+    def __init__(self, capacity=RING_CAPACITY, name=None):
+        self._capacity = capacity
+        create = name is None
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=create, size=HEADER.size + capacity * RECORD.size
+        )
+        if create:
+            HEADER.pack_into(self._shm.buf, 0, 0)
+        self._read = self.written()
+        self.lost = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def written(self):
+        return HEADER.unpack_from(self._shm.buf, 0)[0]
+
+    def _offset(self, index):
+        return HEADER.size + (index % self._capacity) * RECORD.size
+
+    def put(self, msg):
+        n = self.written()
+        RECORD.pack_into(
+            self._shm.buf,
+            self._offset(n),
+            msg["tstamp"].timestamp(),
+            msg.get("seq", -1),
+            msg["freq"],
+            msg["mag"],
+            msg["tamb"],
+            msg["tsky"],
+        )
+        HEADER.pack_into(self._shm.buf, 0, n + 1)
+
+    def skip(self):
+        """Discards pending records"""
+        self._read = self.written()
+
+    def get_batch(self):
+        """Returns pending records as photometer message dictionaries"""
+        start = max(self._read, self.written() - self._capacity)
+        end = self.written()
+        self.lost += start - self._read
+        records = [RECORD.unpack_from(self._shm.buf, self._offset(i)) for i in range(start, end)]
+        # Records overwritten while being copied are discarded
+        overwritten = max(0, self.written() - self._capacity - start)
+        self.lost += overwritten
+        self._read = end
+        return [
+            {
+                "tstamp": datetime.fromtimestamp(tstamp, timezone.utc),
+                "seq": seq,
+                "freq": freq,
+                "mag": mag,
+                "tamb": tamb,
+                "tsky": tsky,
+            }
+            for tstamp, seq, freq, mag, tamb, tsky in records[overwritten:]
+        ]
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+
+class AcquisitionProcess:
+    """Runs the photometer readings producer in a separate process,
+    isolating device timing from the UI and database work in the main event loop"""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self._capacity = capacity
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._stop_event = None
+        self.ring = None
+
+    def start(self):
+        self.ring = SharedRing(self._capacity)
+        self._stop_event = self._context.Event()
+        self._process = self._context.Process(
+            target=acquire,
+            args=(self.ring.name, self._capacity, self._stop_event),
+            name="acquisition",
+            daemon=True,
+        )
+        self._process.start()
+        log.info("Started acquisition process %d", self._process.pid)
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._stop_event.set()
+        self._process.join(JOIN_TIMEOUT)
+        if self._process.is_alive():
+            self._process.terminate()
+        if self.ring.lost:
+            log.warning("Acquisition ring lost %d readings", self.ring.lost)
+        self.ring.close()
+        self.ring.unlink()
+        self._process = None
+
+    async def batches(self):
+        """Yields batches of readings as soon as they are available in the ring"""
+        while True:
+            batch = self.ring.get_batch()
+            if batch:
+                yield batch
+            else:
+                await asyncio.sleep(POLL_PERIOD)
+
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+async def _acquire(ring, stop_event):
+    # Although we use TEST / REF roles, we always build TEST like Photometer objects
+    photometer = PhotometerBuilder().build(Model.TESSW, Role.TEST)
+    producer = asyncio.create_task(photometer.readings())
+    while not stop_event.is_set():
+        try:
+            msg = await asyncio.wait_for(photometer.queue.get(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            continue
+        ring.put(msg)
+    producer.cancel()
+
+
+def acquire(ring_name, capacity, stop_event):
+    """Acquisition process entry point"""
+    ring = SharedRing(capacity, name=ring_name)
+    try:
+        asyncio.run(_acquire(ring, stop_event))
+    finally:
+        ring.close()
@@ -0,0 +1,239 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import csv
+import logging
+import collections
+
+# -------------------
+# Third party imports
+# -------------------
+
+import numpy as np
+
+from sqlalchemy import select, func
+
+from lica.asyncio.photometer import Role
+
+# --------------
+# local imports
+# -------------
+
+from .dbase.model import Sample, Step, Bin
+from .dbase.blob import unpack
+
+# ----------------
+# Module constants
+# ----------------
+
+HEADERS = (
+    "wavelength",
+    "ref_n",
+    "ref_median",
+    "ref_stdev",
+    "test_n",
+    "test_median",
+    "test_stdev",
+    "ratio",
+    "ratio_err",
+    "norm",
+    "norm_err",
+)
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def group_statistics(wave, freq):
+    """Per wavelength count, median (low), mean and stdev of frequencies.
+    All computed in vectorized form over the wavelength-sorted arrays."""
+    if wave.size == 0:
+        empty = np.empty(0)
+        return wave, np.empty(0, dtype=np.int64), empty, empty, empty
+    order = np.lexsort((freq, wave))
+    wave, freq = wave[order], freq[order]
+    waves, start, count = np.unique(wave, return_index=True, return_counts=True)
+    median = freq[start + (count - 1) // 2]
+    mean = np.add.reduceat(freq, start) / count
+    sq = np.add.reduceat((freq - np.repeat(mean, count)) ** 2, start)
+    stdev = np.sqrt(sq / np.maximum(count - 1, 1))
+    return waves, count, median, mean, stdev
+
+
+def bin_statistics(wave, count, median, mean, stdev):
+    """Per wavelength statistics of binned readings, in group_statistics() form.
+    Count, mean and stdev are exact, pooling the within and between bin variances.
+    The median is the count weighted (low) median of the bin medians."""
+    if wave.size == 0:
+        return group_statistics(wave, mean)
+    order = np.lexsort((median, wave))
+    wave, count, median, mean, stdev = (a[order] for a in (wave, count, median, mean, stdev))
+    waves, start, nbins = np.unique(wave, return_index=True, return_counts=True)
+    total = np.add.reduceat(count, start)
+    grand = np.add.reduceat(count * mean, start) / total
+    spread = count * (mean - np.repeat(grand, nbins)) ** 2
+    sq = np.add.reduceat((count - 1) * stdev**2 + spread, start)
+    # First bin whose cumulative count reaches the median_low position of each wavelength
+    cumulative = np.cumsum(count)
+    before = cumulative[start] - count[start]
+    median = median[np.searchsorted(cumulative, before + (total - 1) // 2 + 1)]
+    return waves, total, median, grand, np.sqrt(sq / np.maximum(total - 1, 1))
+
+
+def merge_statistics(raw, binned):
+    """Binned wavelength statistics take precedence over raw ones, as the raw
+    readings kept for debugging at those wavelengths are already in the bins"""
+    keep = ~np.isin(raw[0], binned[0])
+    merged = [np.concatenate((r[keep], b)) for r, b in zip(raw, binned)]
+    order = np.argsort(merged[0], kind="stable")
+    return tuple(a[order] for a in merged)
+
+
+def statistics_response(ref, test):
+    """Spectral response from per wavelength group_statistics() tuples"""
+    r_wave, r_n, r_median, _, r_stdev = ref
+    t_wave, t_n, t_median, _, t_stdev = test
+    waves, ri, ti = np.intersect1d(r_wave, t_wave, assume_unique=True, return_indices=True)
+    r_n, r_median, r_stdev = r_n[ri], r_median[ri], r_stdev[ri]
+    t_n, t_median, t_stdev = t_n[ti], t_median[ti], t_stdev[ti]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = t_median / r_median
+        t_rel = t_stdev / (t_median * np.sqrt(t_n))
+        r_rel = r_stdev / (r_median * np.sqrt(r_n))
+        rel_err = np.hypot(t_rel, r_rel)
+    ratio_err = np.abs(ratio) * rel_err
+    peak = np.nanmax(ratio) if ratio.size else 1.0
+    return {
+        "wavelength": waves,
+        "ref_n": r_n,
+        "ref_median": r_median,
+        "ref_stdev": r_stdev,
+        "test_n": t_n,
+        "test_median": t_median,
+        "test_stdev": t_stdev,
+        "ratio": ratio,
+        "ratio_err": ratio_err,
+        "norm": ratio / peak,
+        "norm_err": ratio_err / peak,
+    }
+
+
+def spectral_response(ref, test):
+    """TEST/REF median ratio per common wavelength, normalized to its maximum.
+    Uncertainties are the standard errors of both photometers added in quadrature.
+    ref and test are (wave, freq) array pairs."""
+    return statistics_response(group_statistics(*ref), group_statistics(*test))
+
+
+def archive_response(archive):
+    """Spectral response straight from a memory mapped store.SessionArchive, no database access"""
+    return spectral_response(archive.arrays(Role.REF), archive.arrays(Role.TEST))
+
+
+def rows(response):
+    """Iterates over a spectral response as tuples in HEADERS order"""
+    return zip(*(response[header].tolist() for header in HEADERS))
+
+
+def export_response(response, filename):
+    with open(filename, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile, delimiter=";")
+        writer.writerow(HEADERS)
+        writer.writerows(rows(response))
+
+
+# -------
+# Classes
+# -------
+
+
+class SpectralAnalyzer:
+    """Computes the spectral response of a session, caching results
+    keyed by (session, sample count watermark)"""
+
+    def __init__(self, session_class, maxsize=8):
+        self.session_class = session_class
+        self._maxsize = maxsize
+        self._cache = collections.OrderedDict()
+
+    async def watermark(self, session_id):
+        async with self.session_class() as session:
+            async with session.begin():
+                q = select(func.count(Sample.id), func.max(Sample.id)).where(
+                    Sample.session == session_id
+                )
+                samples = tuple((await session.execute(q)).one())
+                q = select(func.count(Step.id), func.max(Step.id)).where(Step.session == session_id)
+                steps = tuple((await session.execute(q)).one())
+                q = select(func.count(Bin.id), func.max(Bin.id)).where(Bin.session == session_id)
+                bins = tuple((await session.execute(q)).one())
+        return samples + steps + bins
+
+    async def load(self, session_id, role):
+        """Loads a session role samples as (wave, freq) NumPy arrays,
+        with a single query per storage layout"""
+        async with self.session_class() as session:
+            async with session.begin():
+                q = select(Sample.wave, Sample.freq).where(
+                    Sample.session == session_id, Sample.role == role.tag()
+                )
+                data = np.array((await session.execute(q)).all(), dtype=np.float64).reshape(-1, 2)
+                q = select(Step.wave, Step.nsamples, Step.freqs).where(
+                    Step.session == session_id, Step.role == role.tag()
+                )
+                steps = (await session.execute(q)).all()
+        wave, freq = data[:, 0].astype(np.int64), data[:, 1]
+        if steps:
+            wave = np.concatenate([wave] + [np.full(n, w, dtype=np.int64) for w, n, _ in steps])
+            freq = np.concatenate([freq] + [unpack(blob) for _, _, blob in steps])
+        return wave, freq
+
+    async def load_bins(self, session_id, role):
+        """Loads a session role bins as (wave, count, median, mean, stdev) NumPy arrays"""
+        async with self.session_class() as session:
+            async with session.begin():
+                q = select(
+                    Bin.wave, Bin.count, Bin.freq_median, Bin.freq_mean, Bin.freq_stdev
+                ).where(Bin.session == session_id, Bin.role == role.tag())
+                data = np.array((await session.execute(q)).all(), dtype=np.float64).reshape(-1, 5)
+        wave, count = data[:, 0].astype(np.int64), data[:, 1].astype(np.int64)
+        return wave, count, data[:, 2], data[:, 3], data[:, 4]
+
+    async def statistics(self, session_id, role):
+        """Per wavelength group_statistics() of a session role, from samples and bins"""
+        raw = group_statistics(*await self.load(session_id, role))
+        return merge_statistics(raw, bin_statistics(*await self.load_bins(session_id, role)))
+
+    async def compute(self, session_id):
+        key = (session_id, await self.watermark(session_id))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            log.info("Spectral response for session %s found in cache", session_id)
+            return self._cache[key]
+        ref = await self.statistics(session_id, Role.REF)
+        test = await self.statistics(session_id, Role.TEST)
+        log.info(
+            "Computing spectral response for session %s from %d REF and %d TEST samples",
+            session_id,
+            ref[1].sum(),
+            test[1].sum(),
+        )
+        response = statistics_response(ref, test)
+        self._cache[key] = response
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+        return response
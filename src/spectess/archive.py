@@ -0,0 +1,357 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import sys
+import json
+import asyncio
+import logging
+
+from pathlib import Path
+from datetime import datetime
+
+# -------------------
+# Third party imports
+# -------------------
+
+import numpy as np
+
+from sqlalchemy import select, delete, func, union
+from sqlalchemy.dialects.sqlite import insert
+
+from lica.textual.argparse import args_parser
+from lica.textual.logging import configure_logging
+from lica.sqlalchemy.asyncio.dbase import url, engine
+
+# --------------
+# local imports
+# -------------
+
+from . import __version__
+from .dbase.model import Sample, Step, Bin, Photometer, create_missing
+from .dbase.blob import to_micros, from_micros, expand_step
+from .dbase.bulk import insert_samples, format_tstamp
+
+# ----------------
+# Module constants
+# ----------------
+
+DESCRIPTION = "Archive old sessions to compressed columnar files and compact the database"
+
+DELETE_BATCH = 20_000
+INSERT_BATCH = 50_000
+# Pages released per incremental vacuum run
+VACUUM_PAGES = 10_000
+# auto_vacuum pragma values
+AUTO_VACUUM_INCREMENTAL = 2
+
+COLUMNS = ("mac", "role", "filter", "tstamp", "seq", "wave", "freq", "mag", "temp_box")
+BIN_COLUMNS = (
+    "mac",
+    "role",
+    "filter",
+    "wave",
+    "count",
+    "tstamp_first",
+    "tstamp_last",
+    "seq_first",
+    "seq_last",
+    "freq_mean",
+    "freq_median",
+    "freq_stdev",
+    "mag_mean",
+    "temp_box_mean",
+)
+PHOTOMETER_COLUMNS = ("name", "mac", "sensor", "model", "firmware", "zero_point", "freq_offset")
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__.split(".")[-1])
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def archive_path(directory, session_id):
+    return Path(directory) / f"archive_{session_id}.npz"
+
+
+async def old_sessions(conn, before):
+    """Sessions whose last sample is older than the cutoff datetime"""
+    q = union(
+        select(Sample.session).group_by(Sample.session).having(func.max(Sample.tstamp) < before),
+        select(Step.session).group_by(Step.session).having(func.max(Step.tstamp_last) < before),
+        select(Bin.session).group_by(Bin.session).having(func.max(Bin.tstamp_last) < before),
+    )
+    return sorted((await conn.execute(q)).scalars().all())
+
+
+async def read_session(conn, session_id):
+    """Whole session, in all storage layouts, as dictionaries of sample and bin columns"""
+    records = list()
+    q = (
+        select(
+            Photometer.mac,
+            Sample.role,
+            Sample.filter,
+            Sample.tstamp,
+            Sample.seq,
+            Sample.wave,
+            Sample.freq,
+            Sample.mag,
+            Sample.temp_box,
+        )
+        .join(Sample.photometer)
+        .where(Sample.session == session_id)
+        .order_by(Sample.id)
+    )
+    for mac, role, filt, tstamp, *values in await conn.execute(q):
+        records.append((mac, role, filt, to_micros(tstamp), *values))
+    q = (
+        select(
+            Photometer.mac,
+            Step.role,
+            Step.filter,
+            Step.wave,
+            Step.tstamps,
+            Step.seqs,
+            Step.mags,
+            Step.freqs,
+            Step.temps_box,
+        )
+        .join(Step.photometer)
+        .where(Step.session == session_id)
+    )
+    for step in await conn.execute(q):
+        prefix = (step.mac, step.role, step.filter)
+        for tstamp, seq, mag, freq, temp_box in expand_step(step):
+            records.append(prefix + (to_micros(tstamp), seq, step.wave, freq, mag, temp_box))
+    columns = dict(zip(COLUMNS, zip(*records))) if records else {c: () for c in COLUMNS}
+    q = (
+        select(Photometer.mac, *(getattr(Bin, c) for c in BIN_COLUMNS[1:]))
+        .join(Bin.photometer)
+        .where(Bin.session == session_id)
+        .order_by(Bin.id)
+    )
+    records = [
+        (*row[:5], to_micros(row.tstamp_first), to_micros(row.tstamp_last), *row[7:])
+        for row in await conn.execute(q)
+    ]
+    bins = dict(zip(BIN_COLUMNS, zip(*records))) if records else {c: () for c in BIN_COLUMNS}
+    q = select(*(getattr(Photometer, c) for c in PHOTOMETER_COLUMNS)).where(
+        Photometer.mac.in_(set(columns["mac"]) | set(bins["mac"]))
+    )
+    photometers = [dict(zip(PHOTOMETER_COLUMNS, row)) for row in await conn.execute(q)]
+    return columns, bins, photometers
+
+
+def write_columns(path, session_id, columns, bins, photometers):
+    """Bin columns are stored with a bin_ prefix"""
+    np.savez_compressed(
+        path,
+        session=np.array(session_id),
+        photometers=np.array(json.dumps(photometers)),
+        mac=np.array(columns["mac"], dtype="U17"),
+        role=np.array(columns["role"], dtype="U4"),
+        filter=np.array(columns["filter"], dtype="U6"),
+        tstamp=np.array(columns["tstamp"], dtype=np.int64),
+        seq=np.array(columns["seq"], dtype=np.int64),
+        wave=np.array(columns["wave"], dtype=np.int64),
+        freq=np.array(columns["freq"], dtype=np.float64),
+        mag=np.array(columns["mag"], dtype=np.float64),
+        temp_box=np.array(columns["temp_box"], dtype=np.float64),
+        bin_mac=np.array(bins["mac"], dtype="U17"),
+        bin_role=np.array(bins["role"], dtype="U4"),
+        bin_filter=np.array(bins["filter"], dtype="U6"),
+        **{
+            f"bin_{c}": np.array(bins[c], dtype=np.int64)
+            for c in ("wave", "count", "tstamp_first", "tstamp_last", "seq_first", "seq_last")
+        },
+        **{
+            f"bin_{c}": np.array(bins[c], dtype=np.float64)
+            for c in ("freq_mean", "freq_median", "freq_stdev", "mag_mean", "temp_box_mean")
+        },
+    )
+
+
+async def delete_session(session_id):
+    """Deletes a session in batched transactions, so that readers are never locked out for long"""
+    deleted = 0
+    while True:
+        async with engine.begin() as conn:
+            ids = select(Sample.id).where(Sample.session == session_id).limit(DELETE_BATCH)
+            q = delete(Sample).where(Sample.id.in_(ids.scalar_subquery()))
+            result = await conn.execute(q)
+        if result.rowcount == 0:
+            break
+        deleted += result.rowcount
+    async with engine.begin() as conn:
+        await conn.execute(delete(Step).where(Step.session == session_id))
+        await conn.execute(delete(Bin).where(Bin.session == session_id))
+    return deleted
+
+
+async def compact():
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        mode = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar_one()
+        if mode != AUTO_VACUUM_INCREMENTAL:
+            log.info("Switching database to incremental auto vacuum (one time full VACUUM)")
+            await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            await conn.exec_driver_sql("VACUUM")
+        else:
+            while True:
+                free = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar_one()
+                if free == 0:
+                    break
+                await conn.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+        await conn.exec_driver_sql("ANALYZE")
+
+
+async def move(directory, before, dry_run):
+    await create_missing(engine)
+    async with engine.connect() as conn:
+        sessions = await old_sessions(conn, before)
+    log.info("%d sessions older than %s", len(sessions), before)
+    if sessions and not dry_run:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+    for session_id in sessions:
+        path = archive_path(directory, session_id)
+        async with engine.connect() as conn:
+            columns, bins, photometers = await read_session(conn, session_id)
+        if dry_run:
+            log.info(
+                "Would archive session %s (%d samples, %d bins)",
+                session_id,
+                len(columns["seq"]),
+                len(bins["count"]),
+            )
+            continue
+        write_columns(path, session_id, columns, bins, photometers)
+        deleted = await delete_session(session_id)
+        log.info("Archived session %s to %s, %d samples deleted", session_id, path, deleted)
+    if sessions and not dry_run:
+        await compact()
+    await engine.dispose()
+
+
+async def attach_bins(conn, session_id, columns, phot_ids):
+    """Inserts the archived bins not already present. Archives written before
+    bins_t existed have no bin columns"""
+    if "bin_mac" not in columns:
+        return 0
+    bins = {c: columns[f"bin_{c}"].tolist() for c in BIN_COLUMNS}
+    q = select(Bin.phot_id, Bin.role, Bin.wave, Bin.tstamp_first).where(Bin.session == session_id)
+    present = {tuple(row) for row in await conn.execute(q)}
+    rows = list()
+    for values in zip(*(bins[c] for c in BIN_COLUMNS)):
+        row = dict(
+            zip(BIN_COLUMNS[1:], values[1:]), phot_id=phot_ids[values[0]], session=session_id
+        )
+        row["tstamp_first"] = from_micros(row["tstamp_first"])
+        row["tstamp_last"] = from_micros(row["tstamp_last"])
+        if (row["phot_id"], row["role"], row["wave"], row["tstamp_first"]) not in present:
+            rows.append(row)
+    if rows:
+        await conn.execute(insert(Bin), rows)
+    return len(rows)
+
+
+async def attach(directory, session_id):
+    """Loads an archived session back into samples_t and bins_t"""
+    await create_missing(engine)
+    path = archive_path(directory, session_id)
+    with np.load(path) as archive:
+        columns = {key: archive[key] for key in archive.files}
+    photometers = json.loads(str(columns["photometers"]))
+    async with engine.begin() as conn:
+        for phot in photometers:
+            await conn.execute(insert(Photometer).values(**phot).on_conflict_do_nothing())
+        q = select(Photometer.mac, Photometer.id).where(
+            Photometer.mac.in_([phot["mac"] for phot in photometers])
+        )
+        phot_ids = dict((await conn.execute(q)).all())
+        rows = [
+            (
+                phot_ids[mac],
+                format_tstamp(from_micros(tstamp)),
+                role,
+                session_id,
+                seq,
+                mag,
+                freq,
+                temp_box,
+                wave,
+                filt,
+            )
+            for mac, role, filt, tstamp, seq, wave, freq, mag, temp_box in zip(
+                columns["mac"].tolist(),
+                columns["role"].tolist(),
+                columns["filter"].tolist(),
+                columns["tstamp"].tolist(),
+                columns["seq"].tolist(),
+                columns["wave"].tolist(),
+                columns["freq"].tolist(),
+                columns["mag"].tolist(),
+                columns["temp_box"].tolist(),
+            )
+        ]
+        inserted = skipped = 0
+        for i in range(0, len(rows), INSERT_BATCH):
+            n, k = await insert_samples(conn, rows[i : i + INSERT_BATCH], conflict="ignore")
+            inserted += n
+            skipped += k
+        nbins = await attach_bins(conn, session_id, columns, phot_ids)
+    await engine.dispose()
+    log.info(
+        "Attached session %s: %d samples, %d already present, %d bins",
+        session_id,
+        inserted,
+        skipped,
+        nbins,
+    )
+
+
+def main():
+    """The main entry point specified by pyproject.toml"""
+    parser = args_parser(name=__name__, version=__version__, description=DESCRIPTION)
+    parser.add_argument(
+        "-d",
+        "--directory",
+        type=str,
+        default=".",
+        metavar="<DIR>",
+        help="Archive directory (default %(default)s)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_move = subparsers.add_parser("move", help="Move old sessions to archive files")
+    parser_move.add_argument(
+        "-b",
+        "--before",
+        type=datetime.fromisoformat,
+        required=True,
+        metavar="<YYYY-MM-DD>",
+        help="Archive sessions whose last sample is older than this date",
+    )
+    parser_move.add_argument(
+        "-n", "--dry-run", action="store_true", help="Only list what would be archived"
+    )
+    parser_attach = subparsers.add_parser("attach", help="Load an archived session back")
+    parser_attach.add_argument("session", type=int, metavar="<ID>", help="Session id")
+    args = parser.parse_args(sys.argv[1:])
+    configure_logging(args)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    log.info("Using database %s", url)
+    if args.command == "move":
+        asyncio.run(move(args.directory, args.before, args.dry_run))
+    else:
+        asyncio.run(attach(args.directory, args.session))
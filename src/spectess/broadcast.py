@@ -0,0 +1,185 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import json
+import asyncio
+import logging
+import itertools
+
+# -------------------
+# Third party imports
+# -------------------
+
+from aiohttp import web, WSMsgType, WSCloseCode
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+# Messages buffered per client before dropping
+BUFFER_SIZE = 256
+
+# Seconds given to open client handlers to finish when stopping
+SHUTDOWN_TIMEOUT = 2.0
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------
+# Classes
+# -------
+
+
+class Client:
+    def __init__(self, client_id, peer, size):
+        self.id = client_id
+        self.peer = peer
+        self.queue = asyncio.Queue(size)
+        self.dropped = 0
+
+    def offer(self, message):
+        """Never blocks: a slow client loses messages instead of slowing down the producer"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def close(self):
+        """Wakes up the client handler with the end of stream marker (None)"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Broadcaster:
+    """Embedded aiohttp server fanning out readings and step statistics
+    to any number of WebSocket (/ws) or Server-Sent Events (/events) clients"""
+
+    def __init__(self, host="127.0.0.1", port=8080, buffer_size=BUFFER_SIZE):
+        self._host = host
+        self._port = port
+        self._buffer_size = buffer_size
+        self._clients = dict()
+        self._ids = itertools.count(1)
+        self._runner = None
+        self.app = web.Application()
+        self.app.add_routes(
+            [
+                web.get("/", self._status),
+                web.get("/ws", self._websocket),
+                web.get("/events", self._events),
+            ]
+        )
+        # WebSocket and SSE handlers never end on their own, so they are told to
+        # or the runner cleanup would wait for them
+        self.app.on_shutdown.append(self._on_shutdown)
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, shutdown_timeout=SHUTDOWN_TIMEOUT)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self._host, self._port).start()
+        except OSError:
+            await self.stop()
+            raise
+        log.info("Broadcasting readings on http://%s:%d/", self._host, self._port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def publish(self, kind, payload):
+        if not self._clients:
+            return
+        message = json.dumps({"type": kind, **payload}, default=str)
+        for client in self._clients.values():
+            client.offer(message)
+
+    async def _on_shutdown(self, app):
+        for client in self._clients.values():
+            client.close()
+
+    def _connect(self, request):
+        client = Client(next(self._ids), request.remote, self._buffer_size)
+        self._clients[client.id] = client
+        log.info("Client %d connected from %s", client.id, client.peer)
+        return client
+
+    def _disconnect(self, client):
+        del self._clients[client.id]
+        log.info(
+            "Client %d from %s disconnected, %d messages dropped",
+            client.id,
+            client.peer,
+            client.dropped,
+        )
+
+    async def _status(self, request):
+        return web.json_response(
+            {
+                "clients": [
+                    {"id": c.id, "peer": c.peer, "dropped": c.dropped}
+                    for c in self._clients.values()
+                ]
+            }
+        )
+
+    async def _websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        client = self._connect(request)
+        # Incoming messages are ignored, but must be read to detect disconnection
+        reader = asyncio.create_task(self._drain(ws))
+        try:
+            while not ws.closed:
+                getter = asyncio.create_task(client.queue.get())
+                done, _ = await asyncio.wait((getter, reader), return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    break
+                message = getter.result()
+                if message is None:
+                    await ws.close(code=WSCloseCode.GOING_AWAY, message=b"Server shutdown")
+                    break
+                await ws.send_str(message)
+        except ConnectionResetError:
+            pass
+        finally:
+            reader.cancel()
+            self._disconnect(client)
+        return ws
+
+    async def _drain(self, ws):
+        async for msg in ws:
+            if msg.type == WSMsgType.ERROR:
+                break
+
+    async def _events(self, request):
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        client = self._connect(request)
+        try:
+            while (message := await client.queue.get()) is not None:
+                await response.write(f"data: {message}\n\n".encode())
+        except ConnectionResetError:
+            pass
+        finally:
+            self._disconnect(client)
+        return response
@@ -0,0 +1,97 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import zlib
+import logging
+
+from datetime import datetime, timedelta
+
+# ---------------------
+# Third party libraries
+# ---------------------
+
+import numpy as np
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+# Timestamps are packed as microseconds since the epoch, taken at face value
+# (timezone dropped) just like SQLAlchemy stores DateTime columns in SQLite
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+COMPRESSION_LEVEL = 6
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+# get the module logger
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def pack(values, dtype=np.float64) -> bytes:
+    return zlib.compress(np.asarray(values, dtype=dtype).tobytes(), COMPRESSION_LEVEL)
+
+
+def unpack(blob: bytes, dtype=np.float64) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype=dtype)
+
+
+def pack_delta(values) -> bytes:
+    """Delta encoded int64 values, which compress much better for monotonic series"""
+    values = np.asarray(values, dtype=np.int64)
+    return pack(np.diff(values, prepend=0), dtype=np.int64)
+
+
+def unpack_delta(blob: bytes) -> np.ndarray:
+    return np.cumsum(unpack(blob, dtype=np.int64))
+
+
+def to_micros(tstamp: datetime) -> int:
+    return (tstamp.replace(tzinfo=None) - EPOCH) // MICROSECOND
+
+
+def from_micros(micros) -> datetime:
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+def pack_step(readings):
+    """Packs a sequence of photometer readings into Step binary column values"""
+    return dict(
+        nsamples=len(readings),
+        tstamp_first=readings[0]["tstamp"],
+        tstamp_last=readings[-1]["tstamp"],
+        tstamps=pack_delta([to_micros(r["tstamp"]) for r in readings]),
+        seqs=pack_delta([r["seq"] for r in readings]),
+        mags=pack([r["mag"] for r in readings]),
+        freqs=pack([r["freq"] for r in readings]),
+        temps_box=pack([r["tamb"] for r in readings]),
+    )
+
+
+def expand_step(step):
+    """Expands a Step back to (tstamp, seq, mag, freq, temp_box) tuples, one per sample"""
+    return zip(
+        (from_micros(t) for t in unpack_delta(step.tstamps)),
+        unpack_delta(step.seqs).tolist(),
+        unpack(step.mags).tolist(),
+        unpack(step.freqs).tolist(),
+        unpack(step.temps_box).tolist(),
+    )
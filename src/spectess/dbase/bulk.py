@@ -0,0 +1,89 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import re
+import logging
+
+from datetime import datetime
+
+# ---------------------
+# Third party libraries
+# ---------------------
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+# Column order of the tuples handled by insert_samples()
+SAMPLE_COLUMNS = (
+    "phot_id",
+    "tstamp",
+    "role",
+    "session",
+    "seq",
+    "mag",
+    "freq",
+    "temp_box",
+    "wave",
+    "filter",
+)
+
+# Same textual timestamp format SQLAlchemy uses to store DateTime columns in SQLite
+TSTAMP_FMT = "%Y-%m-%d %H:%M:%S.%f"
+
+_ISO_TSTAMP = re.compile(r"(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(?:\.(\d{1,6}))?")
+
+_INSERT = "INSERT INTO samples_t ({columns}) VALUES ({values})".format(
+    columns=", ".join(SAMPLE_COLUMNS), values=", ".join("?" * len(SAMPLE_COLUMNS))
+)
+
+ON_CONFLICT = {
+    "ignore": " ON CONFLICT (tstamp, role) DO NOTHING",
+    "update": " ON CONFLICT (tstamp, role) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in SAMPLE_COLUMNS if c not in ("tstamp", "role")),
+}
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+# get the module logger
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def format_tstamp(tstamp) -> str:
+    """Timestamp (datetime or ISO string) as stored by SQLAlchemy in SQLite, timezone dropped"""
+    if isinstance(tstamp, datetime):
+        return tstamp.strftime(TSTAMP_FMT)
+    # ISO strings: 'YYYY-MM-DD[ T]HH:MM:SS[.ffffff][+HH:MM]', no datetime object built
+    date, time, fraction = _ISO_TSTAMP.match(tstamp).groups()
+    return f"{date} {time}.{fraction or '':0<6}"
+
+
+async def insert_samples(conn, rows, conflict="ignore"):
+    """Inserts sample tuples in SAMPLE_COLUMNS order with a single executemany,
+    resolving clashes with the (tstamp, role) unique constraint as per conflict
+    ('ignore' or 'update'). Must be called within a transaction.
+    Returns the (changed, skipped) number of rows."""
+    if not rows:
+        return 0, 0
+    before = (await conn.exec_driver_sql("SELECT total_changes()")).scalar_one()
+    await conn.exec_driver_sql(_INSERT + ON_CONFLICT[conflict], rows)
+    after = (await conn.exec_driver_sql("SELECT total_changes()")).scalar_one()
+    changed = after - before
+    return changed, len(rows) - changed
@@ -19,7 +19,7 @@ from datetime import datetime
 # Third party libraries
 # ---------------------
 
-from sqlalchemy import String, ForeignKey, UniqueConstraint
+from sqlalchemy import String, ForeignKey, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from lica.sqlalchemy.asyncio.dbase import Model
@@ -35,6 +35,26 @@ from lica.sqlalchemy.asyncio.dbase import Model
 # get the module logger
 log = logging.getLogger(__name__)
 
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+async def create_missing(engine):
+    """Brings an existing database up to date with the model, non destructively.
+    Creates the tables and indexes added since the database was created,
+    leaving existing tables and their data untouched."""
+
+    def create(conn):
+        Model.metadata.create_all(conn, checkfirst=True)
+        for table in Model.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(create)
+
+
 # ---------------------------------
 # Data Model, declarative ORM style
 # ---------------------------------
@@ -51,6 +71,20 @@ class Config(Model):
         return f"Config(section={self.section!r}, prop={self.prop!r}, value={self.value!r})"
 
 
+class Watermark(Model):
+    """Last sample and step ids exported per (session, file), for incremental exports"""
+
+    __tablename__ = "export_t"
+
+    session: Mapped[int] = mapped_column(primary_key=True)
+    filename: Mapped[str] = mapped_column(String(255), primary_key=True)
+    last_sample_id: Mapped[int]
+    last_step_id: Mapped[int]
+
+    def __repr__(self) -> str:
+        return f"Watermark(session={self.session!r}, filename={self.filename!r}, last_sample_id={self.last_sample_id!r}, last_step_id={self.last_step_id!r})"
+
+
 class Photometer(Model):
     __tablename__ = "photometer_t"
 
@@ -65,6 +99,8 @@ class Photometer(Model):
 
     # This is not a real column, it s meant for the ORM
     samples: Mapped[list[Sample, ...]] = relationship(back_populates="photometer")
+    steps: Mapped[list[Step, ...]] = relationship(back_populates="photometer")
+    bins: Mapped[list[Bin, ...]] = relationship(back_populates="photometer")
 
     def __repr__(self) -> str:
         return f"TESS(id={self.id!r}, name={self.name!r}, mac={self.mac!r})"
@@ -85,10 +121,76 @@ class Sample(Model):
     wave: Mapped[int]
     filter: Mapped[str] = mapped_column(String(6))
 
-    __table_args__ = (UniqueConstraint("tstamp", "role", name="uq_photometer_t_tstamp_role"),)
+    __table_args__ = (
+        UniqueConstraint("tstamp", "role", name="uq_photometer_t_tstamp_role"),
+        # Index ordered cursors for the REF/TEST as-of join export
+        Index("ix_samples_t_session_role_wave_tstamp", "session", "role", "wave", "tstamp"),
+    )
 
     # This is not a real column, it s meant for the ORM
     photometer: Mapped[Photometer] = relationship(back_populates="samples")
 
     def __repr__(self) -> str:
         return f"Sample(id={self.id!r}, freq={self.freq!r}, mag={self.mag!r}, seq={self.seq!r}, wave={self.wave})"
+
+
+class Step(Model):
+    """Compact storage of a whole wavelength step in a single row.
+    Per sample values are packed in compressed binary columns (see dbase.blob)"""
+
+    __tablename__ = "steps_t"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    phot_id: Mapped[int] = mapped_column(ForeignKey("photometer_t.id"), index=True)
+    role: Mapped[str] = mapped_column(String(4))
+    session: Mapped[int]
+    wave: Mapped[int]
+    filter: Mapped[str] = mapped_column(String(6))
+    nsamples: Mapped[int]
+    tstamp_first: Mapped[datetime]
+    tstamp_last: Mapped[datetime]
+    tstamps: Mapped[bytes] = mapped_column(LargeBinary)
+    seqs: Mapped[bytes] = mapped_column(LargeBinary)
+    mags: Mapped[bytes] = mapped_column(LargeBinary)
+    freqs: Mapped[bytes] = mapped_column(LargeBinary)
+    temps_box: Mapped[bytes] = mapped_column(LargeBinary)
+
+    __table_args__ = (Index("ix_steps_t_session_role_wave", "session", "role", "wave"),)
+
+    # This is not a real column, it s meant for the ORM
+    photometer: Mapped[Photometer] = relationship(back_populates="steps")
+
+    def __repr__(self) -> str:
+        return f"Step(id={self.id!r}, session={self.session!r}, role={self.role!r}, wave={self.wave}, nsamples={self.nsamples})"
+
+
+class Bin(Model):
+    """Aggregates of consecutive readings, saved instead of the readings
+    themselves in the ingest time binning mode"""
+
+    __tablename__ = "bins_t"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    phot_id: Mapped[int] = mapped_column(ForeignKey("photometer_t.id"), index=True)
+    role: Mapped[str] = mapped_column(String(4))
+    session: Mapped[int]
+    wave: Mapped[int]
+    filter: Mapped[str] = mapped_column(String(6))
+    count: Mapped[int]
+    tstamp_first: Mapped[datetime]
+    tstamp_last: Mapped[datetime]
+    seq_first: Mapped[int]
+    seq_last: Mapped[int]
+    freq_mean: Mapped[float]
+    freq_median: Mapped[float]
+    freq_stdev: Mapped[float]
+    mag_mean: Mapped[float]
+    temp_box_mean: Mapped[float]
+
+    __table_args__ = (Index("ix_bins_t_session_role_wave", "session", "role", "wave"),)
+
+    # This is not a real column, it s meant for the ORM
+    photometer: Mapped[Photometer] = relationship(back_populates="bins")
+
+    def __repr__(self) -> str:
+        return f"Bin(id={self.id!r}, session={self.session!r}, role={self.role!r}, wave={self.wave}, count={self.count}, freq_mean={self.freq_mean!r})"
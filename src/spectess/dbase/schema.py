@@ -9,19 +9,26 @@
 # -------------------
 
 import sys
+import time
 import uuid
 import asyncio
 import logging
 
+from datetime import datetime, timedelta
+
 
 # ---------------------
 # Third party libraries
 # ---------------------
 
 
+import numpy as np
+
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession as AsyncSessionClass
 from lica.textual.argparse import args_parser
 from lica.textual.logging import configure_logging
+from lica.asyncio.photometer import Role
 
 from lica.sqlalchemy.asyncio.dbase import url, engine, Model, AsyncSession
 
@@ -30,12 +37,20 @@ from lica.sqlalchemy.asyncio.dbase import url, engine, Model, AsyncSession
 # -------------
 
 from .. import __version__
-from .model import Config
+from .model import Config, Photometer
+from .bulk import insert_samples
+from ..wavelength import WaveLimit, compute_filter
 
 # ----------------
 # Module constants
 # ----------------
 
+# Synthetic data generation
+ZERO_POINT = 20.50
+READING_PERIOD = 1.0  # seconds
+PEAK_FREQ = 1000.0  # Hz, at the synthetic response peak
+BATCH_SIZE = 50_000
+
 # -----------------------
 # Module global variables
 # -----------------------
@@ -58,6 +73,82 @@ async def populate(async_session: async_sessionmaker[AsyncSessionClass]) -> None
             session.add(Config(section="calibration", prop="wave_incr", value=5))
 
 
+def synthetic_response(wave):
+    """Smooth bell shaped spectral response peaking around 550 nm"""
+    return np.exp(-(((wave - 550.0) / 180.0) ** 2))
+
+
+async def synthetic(nphot: int, nsessions: int, nsamples: int, wave_incr: int, seed: int) -> None:
+    """Fills the database with synthetic photometers and REF/TEST sweeps"""
+    rng = np.random.default_rng(seed)
+    waves = range(WaveLimit.MIN, WaveLimit.MAX + 1, wave_incr)
+    total = 0
+    t0 = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        await conn.commit()
+        async with conn.begin():
+            await conn.execute(
+                insert(Photometer),
+                [
+                    dict(
+                        name=f"stars{i + 1}",
+                        mac=":".join(f"{b:02X}" for b in (0xAA, 0xBB, 0xCC, 0, i >> 8, i & 0xFF)),
+                        sensor="TSL237",
+                        model="TESS-W",
+                        firmware="synthetic",
+                        zero_point=ZERO_POINT,
+                        freq_offset=0.0,
+                    )
+                    for i in range(nphot)
+                ],
+            )
+        start = datetime.now().replace(microsecond=0) - timedelta(days=nsessions)
+        for day in range(nsessions):
+            tstamp = start + timedelta(days=day)
+            session_id = int(tstamp.strftime("%Y%m%d%H%M%S"))
+            ref_id = 1
+            test_id = int(rng.integers(2, nphot + 1)) if nphot > 1 else 1
+            rows = list()
+            async with conn.begin():
+                for role, phot_id, gain in (
+                    (Role.REF.tag(), ref_id, 1.0),
+                    (Role.TEST.tag(), test_id, 0.8),
+                ):
+                    for wave in waves:
+                        mean = PEAK_FREQ * gain * synthetic_response(wave) + 1.0
+                        freqs = np.abs(rng.normal(mean, 0.01 * mean, nsamples))
+                        mags = ZERO_POINT - 2.5 * np.log10(freqs)
+                        temps = rng.normal(20.0, 0.2, nsamples)
+                        filt = str(compute_filter(wave))
+                        for seq, (freq, mag, temp) in enumerate(
+                            zip(freqs.tolist(), mags.tolist(), temps.tolist())
+                        ):
+                            tstamp += timedelta(seconds=READING_PERIOD)
+                            rows.append(
+                                (
+                                    phot_id,
+                                    tstamp.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                                    role,
+                                    session_id,
+                                    seq,
+                                    mag,
+                                    freq,
+                                    temp,
+                                    wave,
+                                    filt,
+                                )
+                            )
+                        if len(rows) >= BATCH_SIZE:
+                            total += (await insert_samples(conn, rows))[0]
+                            rows = list()
+                total += (await insert_samples(conn, rows))[0]
+            log.info("Session %d: %d samples so far", session_id, total)
+    await engine.dispose()
+    elapsed = time.perf_counter() - t0
+    log.info("Generated %d samples in %0.1f s (%0.0f rows/s)", total, elapsed, total / elapsed)
+
+
 async def schema() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Model.metadata.drop_all)
@@ -69,6 +160,33 @@ async def schema() -> None:
 def main():
     """The main entry point specified by pyproject.toml"""
     parser = args_parser(name=__name__, version=__version__, description="Example SQLAlchemy App")
+    parser.add_argument(
+        "-p",
+        "--photometers",
+        type=int,
+        default=0,
+        help="Synthetic photometers to create, 0 = no synthetic data (default %(default)s)",
+    )
+    parser.add_argument(
+        "-s", "--sessions", type=int, default=1, help="Synthetic sessions (default %(default)s)"
+    )
+    parser.add_argument(
+        "-n",
+        "--nsamples",
+        type=int,
+        default=17,
+        help="Synthetic samples per role and wavelength step (default %(default)s)",
+    )
+    parser.add_argument(
+        "-w",
+        "--wave-incr",
+        type=int,
+        default=5,
+        help="Synthetic sweeps wavelength increment [nm] (default %(default)s)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="Random seed for reproducible synthetic data"
+    )
     args = parser.parse_args(sys.argv[1:])
     configure_logging(args)
     if args.verbose:
@@ -78,3 +196,12 @@ def main():
         logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
     log.info("Creating new schema for %s", url)
     asyncio.run(schema())
+    if args.photometers > 0:
+        waves = len(range(WaveLimit.MIN, WaveLimit.MAX + 1, args.wave_incr))
+        log.info(
+            "Generating %d synthetic samples",
+            2 * args.sessions * waves * args.nsamples,
+        )
+        asyncio.run(
+            synthetic(args.photometers, args.sessions, args.nsamples, args.wave_incr, args.seed)
+        )
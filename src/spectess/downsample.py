@@ -0,0 +1,121 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import logging
+
+# -------------------
+# Third party imports
+# -------------------
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of a (x,y) series.
+    Returns two lists with at most threshold points, keeping first and last."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(x), list(y)
+    sampled_x = [x[0]]
+    sampled_y = [y[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket, used as the third triangle vertex
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[start:end]) / (end - start)
+        avg_y = sum(y[start:end]) / (end - start)
+        # Pick the point in the current bucket making the largest triangle
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        ax, ay = x[a], y[a]
+        max_area = -1.0
+        for j in range(lo, hi):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                a_next = j
+        sampled_x.append(x[a_next])
+        sampled_y.append(y[a_next])
+        a = a_next
+    sampled_x.append(x[-1])
+    sampled_y.append(y[-1])
+    return sampled_x, sampled_y
+
+
+# -------
+# Classes
+# -------
+
+
+class MinMaxDecimator:
+    """Streaming min/max decimation with bounded memory.
+    Keeps at most capacity buckets. When full, adjacent buckets are merged
+    and the bucket span doubles, so both appending and reading the decimated
+    series cost the same regardless of how many points have been seen."""
+
+    def __init__(self, capacity=128):
+        self._capacity = capacity
+        self.clear()
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._buckets = list()
+        self._span = 1
+        self._pending = None
+        self._pending_n = 0
+        self._count = 0
+
+    def append(self, value):
+        self._count += 1
+        if self._pending is None:
+            self._pending = [value, value]
+        else:
+            self._pending[0] = min(self._pending[0], value)
+            self._pending[1] = max(self._pending[1], value)
+        self._pending_n += 1
+        if self._pending_n == self._span:
+            self._buckets.append(tuple(self._pending))
+            self._pending = None
+            self._pending_n = 0
+            if len(self._buckets) == self._capacity:
+                self._merge()
+
+    def _merge(self):
+        buckets = self._buckets
+        self._buckets = [
+            (min(buckets[i][0], buckets[i + 1][0]), max(buckets[i][1], buckets[i + 1][1]))
+            for i in range(0, len(buckets) - 1, 2)
+        ]
+        self._span *= 2
+
+    def values(self):
+        """Decimated series as alternating min, max values"""
+        buckets = self._buckets + ([tuple(self._pending)] if self._pending else [])
+        return [v for bucket in buckets for v in bucket]
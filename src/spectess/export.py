@@ -0,0 +1,305 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import os
+import csv
+import sys
+import time
+import sqlite3
+import logging
+import multiprocessing
+
+from pathlib import Path
+from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# -------------------
+# Third party imports
+# -------------------
+
+from sqlalchemy.engine import make_url
+
+from lica.textual.argparse import args_parser
+from lica.textual.logging import configure_logging
+from lica.sqlalchemy.asyncio.dbase import url
+
+# --------------
+# local imports
+# -------------
+
+from . import __version__
+from .dbase.blob import expand_step
+
+# ----------------
+# Module constants
+# ----------------
+
+DESCRIPTION = "Export many sessions in parallel, one CSV file per session"
+
+# Samples CSV file layout, shared by the TUI export, this batch export and the importer
+HEADERS = (
+    "name",
+    "mac",
+    "model",
+    "sensor",
+    "freq_offset",
+    "session",
+    "role",
+    "wavelength",
+    "filter",
+    "seq_number",
+    "timestamp",
+    "frequency",
+    "box_temperature",
+)
+
+SELECT_SAMPLES = """
+SELECT p.name, p.mac, p.model, p.sensor, p.freq_offset,
+    s.session, s.role, s.wave, s.filter, s.seq, s.tstamp, s.freq, s.temp_box
+FROM samples_t AS s JOIN photometer_t AS p ON s.phot_id = p.id
+WHERE s.session = ?
+ORDER BY s.wave, s.seq
+"""
+
+SELECT_STEPS = """
+SELECT p.name, p.mac, p.model, p.sensor, p.freq_offset,
+    s.session, s.role, s.wave, s.filter, s.tstamps, s.seqs, s.mags, s.freqs, s.temps_box
+FROM steps_t AS s JOIN photometer_t AS p ON s.phot_id = p.id
+WHERE s.session = ?
+ORDER BY s.wave
+"""
+
+
+# Bins CSV file layout, written next to the samples file of binned sessions
+BIN_HEADERS = (
+    "name",
+    "mac",
+    "model",
+    "sensor",
+    "freq_offset",
+    "session",
+    "role",
+    "wavelength",
+    "filter",
+    "count",
+    "timestamp_first",
+    "timestamp_last",
+    "seq_first",
+    "seq_last",
+    "freq_mean",
+    "freq_median",
+    "freq_stdev",
+    "mag_mean",
+    "box_temperature_mean",
+)
+
+SELECT_BINS = """
+SELECT p.name, p.mac, p.model, p.sensor, p.freq_offset,
+    b.session, b.role, b.wave, b.filter, b.count, b.tstamp_first, b.tstamp_last,
+    b.seq_first, b.seq_last, b.freq_mean, b.freq_median, b.freq_stdev, b.mag_mean, b.temp_box_mean
+FROM bins_t AS b JOIN photometer_t AS p ON b.phot_id = p.id
+WHERE b.session = ?
+ORDER BY b.wave, b.seq_first
+"""
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__.split(".")[-1])
+
+# Blob columns with the attribute names expected by expand_step()
+StepBlobs = namedtuple("StepBlobs", ["tstamps", "seqs", "mags", "freqs", "temps_box"])
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def database_path(db_url=url):
+    return make_url(str(db_url)).database
+
+
+def connect(db_path):
+    """Read only connection, so that exports never block the bench writer"""
+    return sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+
+
+def session_filename(session_id):
+    return f"spectrum_calib_{session_id}.csv"
+
+
+def row_prefix(phot, item):
+    """Leading HEADERS columns, shared by all the samples of a Sample or Step"""
+    return [
+        phot.name,
+        phot.mac,
+        phot.model,
+        phot.sensor,
+        phot.freq_offset,
+        item.session,
+        item.role,
+        item.wave,
+        item.filter,
+    ]
+
+
+def bin_row(phot, b):
+    """Bin in BIN_HEADERS order"""
+    return row_prefix(phot, b) + [
+        b.count,
+        b.tstamp_first,
+        b.tstamp_last,
+        b.seq_first,
+        b.seq_last,
+        b.freq_mean,
+        b.freq_median,
+        b.freq_stdev,
+        b.mag_mean,
+        b.temp_box_mean,
+    ]
+
+
+def bins_filename(path):
+    path = Path(path)
+    return path.with_name(f"{path.stem}_bins{path.suffix}")
+
+
+def write_bins(path, rows):
+    with open(bins_filename(path), "w", newline="") as fd:
+        writer = csv.writer(fd, delimiter=";")
+        writer.writerow(BIN_HEADERS)
+        writer.writerows(rows)
+
+
+def merge_steps(rows, steps):
+    """Rows in HEADERS order, adding the samples of (prefix, step) pairs to the samples_t
+    rows and keeping the (wave, seq) order when both storage layouts are present"""
+    rows = list(rows)
+    for prefix, step in steps:
+        for tstamp, seq, mag, freq, temp_box in expand_step(step):
+            rows.append([*prefix, seq, tstamp, freq, temp_box])
+    if steps:
+        rows.sort(key=lambda row: (row[7], row[9]))
+    return rows
+
+
+def tables(conn):
+    """Tables present, as databases created before a layout was added lack its table"""
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def list_sessions(db_path):
+    conn = connect(db_path)
+    try:
+        present = tables(conn)
+        q = " UNION ".join(
+            f"SELECT session FROM {table}"
+            for table in ("samples_t", "steps_t", "bins_t")
+            if table in present
+        )
+        return [row[0] for row in conn.execute(q + " ORDER BY session")]
+    finally:
+        conn.close()
+
+
+def export_session(db_path, session_id, path):
+    """Process pool worker: exports a session with its own connection.
+    Returns the row count, including bins, which go to their own file"""
+    conn = connect(db_path)
+    try:
+        rows = [
+            [*row[:10], datetime.fromisoformat(row[10]), *row[11:]]
+            for row in conn.execute(SELECT_SAMPLES, (session_id,))
+        ]
+        present = tables(conn)
+        steps = list()
+        if "steps_t" in present:
+            steps = conn.execute(SELECT_STEPS, (session_id,)).fetchall()
+        bins = list()
+        if "bins_t" in present:
+            bins = [
+                [
+                    *row[:10],
+                    datetime.fromisoformat(row[10]),
+                    datetime.fromisoformat(row[11]),
+                    *row[12:],
+                ]
+                for row in conn.execute(SELECT_BINS, (session_id,))
+            ]
+    finally:
+        conn.close()
+    rows = merge_steps(rows, [(list(row[:9]), StepBlobs(*row[9:])) for row in steps])
+    with open(path, "w", newline="") as fd:
+        writer = csv.writer(fd, delimiter=";")
+        writer.writerow(HEADERS)
+        writer.writerows(rows)
+    if bins:
+        write_bins(path, bins)
+    return len(rows) + len(bins)
+
+
+def executor(workers=None):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def batch_export(db_path, sessions, directory, workers=None):
+    t0 = time.perf_counter()
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    total = 0
+    with executor(workers) as pool:
+        futures = {
+            pool.submit(
+                export_session, db_path, session_id, directory / session_filename(session_id)
+            ): session_id
+            for session_id in sessions
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            nrows = future.result()
+            total += nrows
+            log.info("[%d/%d] session %s: %d rows", i, len(futures), futures[future], nrows)
+    log.info(
+        "Exported %d sessions (%d rows) in %0.1f s",
+        len(sessions),
+        total,
+        time.perf_counter() - t0,
+    )
+
+
+def main():
+    """The main entry point specified by pyproject.toml"""
+    parser = args_parser(name=__name__, version=__version__, description=DESCRIPTION)
+    parser.add_argument(
+        "sessions", type=int, nargs="*", metavar="<ID>", help="Sessions to export (default all)"
+    )
+    parser.add_argument(
+        "-d",
+        "--directory",
+        type=str,
+        default=os.getcwd(),
+        metavar="<DIR>",
+        help="Output directory (default current directory)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        metavar="<N>",
+        help="Worker processes (default CPU count)",
+    )
+    args = parser.parse_args(sys.argv[1:])
+    configure_logging(args)
+    db_path = database_path()
+    sessions = args.sessions or list_sessions(db_path)
+    log.info("Exporting %d sessions from %s", len(sessions), db_path)
+    batch_export(db_path, sessions, args.directory, args.workers)
@@ -0,0 +1,203 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import sys
+import csv
+import math
+import time
+import asyncio
+import logging
+import itertools
+
+# -------------------
+# Third party imports
+# -------------------
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from lica.textual.argparse import args_parser
+from lica.textual.logging import configure_logging
+from lica.sqlalchemy.asyncio.dbase import url, engine
+
+# --------------
+# local imports
+# -------------
+
+from . import __version__
+from .dbase.model import Photometer
+from .dbase.bulk import insert_samples, format_tstamp
+from .export import HEADERS
+
+# ----------------
+# Module constants
+# ----------------
+
+DESCRIPTION = "Bulk import of exported samples files into the database"
+
+BATCH_SIZE = 50_000
+BATCHES_PER_TRANSACTION = 10
+# Used to compute magnitudes, which are not exported
+DEF_ZERO_POINT = 20.50
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__.split(".")[-1])
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def read_csv(path, batch_size):
+    with open(path, newline="") as fd:
+        reader = csv.reader(fd, delimiter=";")
+        header = next(reader)
+        indices = [header.index(column) for column in HEADERS]
+        rows = (tuple(row[i] for i in indices) for row in reader)
+        while batch := list(itertools.islice(rows, batch_size)):
+            yield batch
+
+
+def read_parquet(path, batch_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet import needs the 'pyarrow' package (spectess[parquet])")
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=list(HEADERS)):
+        yield list(zip(*(column.to_pylist() for column in batch.columns)))
+
+
+def read_batches(paths, batch_size):
+    for path in paths:
+        log.info("Reading %s", path)
+        reader = read_parquet if str(path).endswith(".parquet") else read_csv
+        yield from reader(path, batch_size)
+
+
+def magnitude(zero_point, freq, freq_offset):
+    f = freq - freq_offset
+    return zero_point - 2.5 * math.log10(f) if f > 0 else math.inf
+
+
+async def upsert_photometers(conn, batch, phot_ids, zero_point):
+    """Upserts photometers not seen yet by MAC, updating phot_ids in place"""
+    for row in batch:
+        name, mac, model, sensor, freq_offset = row[:5]
+        if mac in phot_ids:
+            continue
+        stmt = insert(Photometer).values(
+            name=name,
+            mac=mac,
+            model=model,
+            sensor=sensor,
+            firmware="",
+            zero_point=zero_point,
+            freq_offset=float(freq_offset),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["mac"],
+            set_=dict(name=name, model=model, sensor=sensor, freq_offset=float(freq_offset)),
+        )
+        await conn.execute(stmt)
+        q = select(Photometer.id, Photometer.zero_point).where(Photometer.mac == mac)
+        phot_ids[mac] = tuple((await conn.execute(q)).one())
+
+
+def to_samples(batch, phot_ids):
+    result = list()
+    for row in batch:
+        mac, freq_offset = row[1], float(row[4])
+        phot_id, zero_point = phot_ids[mac]
+        freq = float(row[11])
+        result.append(
+            (
+                phot_id,
+                format_tstamp(row[10]),
+                row[6],
+                int(row[5]),
+                int(row[9]),
+                magnitude(zero_point, freq, freq_offset),
+                freq,
+                float(row[12]),
+                int(row[7]),
+                row[8],
+            )
+        )
+    return result
+
+
+async def import_samples(paths, zero_point, batch_size, batches_per_tx):
+    phot_ids = dict()
+    inserted = skipped = 0
+    t0 = time.perf_counter()
+    async with engine.connect() as conn:
+        trans = None
+        for i, batch in enumerate(read_batches(paths, batch_size)):
+            if trans is None:
+                trans = await conn.begin()
+            await upsert_photometers(conn, batch, phot_ids, zero_point)
+            n, k = await insert_samples(conn, to_samples(batch, phot_ids), conflict="ignore")
+            inserted += n
+            skipped += k
+            if (i + 1) % batches_per_tx == 0:
+                await trans.commit()
+                trans = None
+                log.info("Committed %d samples so far", inserted)
+        if trans is not None:
+            await trans.commit()
+    await engine.dispose()
+    elapsed = time.perf_counter() - t0
+    log.info(
+        "Imported %d samples (%d duplicates skipped) in %0.1f s, %0.0f rows/s",
+        inserted,
+        skipped,
+        elapsed,
+        (inserted + skipped) / elapsed if elapsed else 0.0,
+    )
+
+
+def main():
+    """The main entry point specified by pyproject.toml"""
+    parser = args_parser(name=__name__, version=__version__, description=DESCRIPTION)
+    parser.add_argument(
+        "files", type=str, nargs="+", metavar="<FILE>", help="semicolon CSV or Parquet files"
+    )
+    parser.add_argument(
+        "-z",
+        "--zero-point",
+        type=float,
+        default=DEF_ZERO_POINT,
+        help="Zero point for new photometers, used to compute magnitudes (default %(default)s)",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="Rows per executemany batch (default %(default)s)",
+    )
+    parser.add_argument(
+        "-t",
+        "--batches-per-transaction",
+        type=int,
+        default=BATCHES_PER_TRANSACTION,
+        help="Batches committed per transaction (default %(default)s)",
+    )
+    args = parser.parse_args(sys.argv[1:])
+    configure_logging(args)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    log.info("Importing %d files into %s", len(args.files), url)
+    asyncio.run(
+        import_samples(args.files, args.zero_point, args.batch_size, args.batches_per_transaction)
+    )
@@ -0,0 +1,181 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import time
+import asyncio
+import logging
+import itertools
+import contextvars
+import collections
+
+from enum import Enum
+
+# -------------------
+# Third party imports
+# -------------------
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+
+class JobClass(Enum):
+    CAPTURE = "capture"
+    EXPORT = "export"
+    MAINTENANCE = "maintenance"
+
+    def __str__(self):
+        return f"{self.value}"
+
+
+class JobState(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __str__(self):
+        return f"{self.value}"
+
+
+# Maximum jobs running at the same time per class
+DEF_LIMITS = {
+    JobClass.CAPTURE: 1,
+    JobClass.EXPORT: 2,
+    JobClass.MAINTENANCE: 1,
+}
+
+# Finished jobs kept for display
+HISTORY = 50
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# Job being run in the current task, for progress reporting
+current_job = contextvars.ContextVar("current_job", default=None)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def progress(done, total=None):
+    """Reports progress of the job running the calling coroutine, if any"""
+    job = current_job.get()
+    if job is not None:
+        job.done = done
+        if total is not None:
+            job.total = total
+
+
+# -------
+# Classes
+# -------
+
+
+class Job:
+    def __init__(self, job_id, name, job_class):
+        self.id = job_id
+        self.name = name
+        self.job_class = job_class
+        self.state = JobState.PENDING
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.task = None
+
+    def __repr__(self) -> str:
+        return (
+            f"Job(id={self.id!r}, name={self.name!r}, class={self.job_class}, state={self.state})"
+        )
+
+    @property
+    def active(self):
+        return self.state in (JobState.PENDING, JobState.RUNNING)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def progress_text(self):
+        if self.total:
+            return f"{100 * self.done / self.total:0.0f}%"
+        return str(self.done) if self.done else ""
+
+
+class JobManager:
+    """Runs coroutines as named jobs, with a concurrency limit per job class,
+    progress reporting and cancellation"""
+
+    def __init__(self, limits=None):
+        limits = limits or DEF_LIMITS
+        self._semaphores = {cls: asyncio.Semaphore(n) for cls, n in limits.items()}
+        self._jobs = collections.OrderedDict()
+        self._ids = itertools.count(1)
+
+    def submit(self, name, job_class, coro):
+        job = Job(next(self._ids), name, job_class)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, coro), name=f"job-{job.id}")
+        self._trim()
+        return job
+
+    async def _run(self, job, coro):
+        try:
+            async with self._semaphores[job.job_class]:
+                job.state = JobState.RUNNING
+                job.started = time.monotonic()
+                current_job.set(job)
+                log.info("Job %d %s started", job.id, job.name)
+                result = await coro
+        except asyncio.CancelledError:
+            coro.close()
+            job.state = JobState.CANCELLED
+            log.info("Job %d %s cancelled", job.id, job.name)
+            raise
+        except Exception as e:
+            job.state = JobState.FAILED
+            job.error = e
+            log.exception("Job %d %s failed", job.id, job.name)
+        else:
+            job.state = JobState.DONE
+            log.info("Job %d %s done in %0.1f s", job.id, job.name, job.elapsed)
+            return result
+        finally:
+            job.finished = time.monotonic()
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            job.task.cancel()
+
+    def busy(self, job_class):
+        return any(job.active and job.job_class is job_class for job in self._jobs.values())
+
+    def jobs(self):
+        return tuple(self._jobs.values())
+
+    def _trim(self):
+        finished = [job.id for job in self._jobs.values() if not job.active]
+        for job_id in finished[: max(0, len(finished) - HISTORY)]:
+            del self._jobs[job_id]
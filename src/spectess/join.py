@@ -0,0 +1,63 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import logging
+
+from datetime import timedelta
+
+# -------------------
+# Third party imports
+# -------------------
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+async def asof_join(left, right, tolerance=timedelta(seconds=1), direction="backward"):
+    """Sorted-merge as-of join of two async row iterators, both ordered by (wave, tstamp).
+    For each left row yields a (left, right) pair where right is the latest row
+    of the same wavelength at or before it ("backward") or the closest one ("nearest"),
+    or None if there is none within tolerance. Runs in O(n) holding only two right rows."""
+    right = aiter(right)
+    current = None
+    following = await anext(right, None)
+    async for row in left:
+        while following is not None and (following.wave, following.tstamp) <= (
+            row.wave,
+            row.tstamp,
+        ):
+            current = following
+            following = await anext(right, None)
+        candidates = [current]
+        if direction == "nearest":
+            candidates.append(following)
+        match = None
+        for candidate in candidates:
+            if candidate is None or candidate.wave != row.wave:
+                continue
+            delta = abs(row.tstamp - candidate.tstamp)
+            if delta <= tolerance and (match is None or delta < abs(row.tstamp - match.tstamp)):
+                match = candidate
+        yield row, match
@@ -0,0 +1,100 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import time
+import queue
+import random
+import logging
+
+from logging.handlers import QueueHandler, QueueListener
+
+# -------------------
+# Third party imports
+# -------------------
+
+from sqlalchemy import event
+from textual.logging import TextualHandler
+
+# --------------
+# local imports
+# -------------
+
+# ----------------
+# Module constants
+# ----------------
+
+# SQL statements shown in full up to this length
+MAX_STATEMENT = 200
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def install_queue_logging():
+    """Moves the root logger handlers behind a queue drained by a listener thread,
+    so that logging from the event loop only enqueues the record.
+    The Textual handler stays in place, as it needs the active app context of the caller.
+    Call it after configure_logging() and stop the returned listener on exit."""
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, TextualHandler)]
+    for handler in handlers:
+        root.removeHandler(handler)
+    records = queue.SimpleQueue()
+    root.addHandler(QueueHandler(records))
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+# -------
+# Classes
+# -------
+
+
+class SQLTrace:
+    """Opt-in sampled SQL trace. A fraction of the statements executed by the engine
+    are logged with their duration and number of parameter sets, but without the
+    parameters themselves, which is what makes the sqlalchemy.engine echo so costly"""
+
+    def __init__(self, engine, rate):
+        self._rate = rate
+        self._log = logging.getLogger("sql")
+        self._engine = engine.sync_engine
+        event.listen(self._engine, "before_cursor_execute", self._before)
+        event.listen(self._engine, "after_cursor_execute", self._after)
+
+    def remove(self):
+        event.remove(self._engine, "before_cursor_execute", self._before)
+        event.remove(self._engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if random.random() < self._rate:
+            conn.info["sql_trace_t0"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        t0 = conn.info.pop("sql_trace_t0", None)
+        if t0 is None:
+            return
+        statement = " ".join(statement.split())
+        if len(statement) > MAX_STATEMENT:
+            statement = statement[:MAX_STATEMENT] + " ..."
+        self._log.info(
+            "%0.2f ms [%d rows] %s",
+            1000 * (time.perf_counter() - t0),
+            len(parameters) if executemany else 1,
+            statement,
+        )
@@ -18,6 +18,7 @@ import logging
 from lica.sqlalchemy.asyncio.dbase import engine, AsyncSession
 from lica.textual.argparse import args_parser
 from lica.textual.logging import configure_logging
+from lica.asyncio.photometer import Role
 
 # --------------
 # local imports
@@ -27,6 +28,10 @@ from . import __version__
 
 from .tui.application import MyTextualApp
 from .tui.controller import Controller
+from .replay import ReplayPhotometer
+from .broadcast import Broadcaster
+from .logqueue import install_queue_logging, SQLTrace
+from .monochromator import SerialMonochromator, SimulatedMonochromator, DEF_SETTLE
 
 # ----------------
 # Module constants
@@ -49,12 +54,162 @@ log = logging.getLogger()
 def main():
     """The main entry point specified by pyproject.toml"""
     parser = args_parser(name=__name__, version=__version__, description=DESCRIPTION)
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="<FILE>",
+        help="Append per wavelength step timeline trace to this JSON Lines file",
+    )
+    parser.add_argument(
+        "--on-conflict",
+        choices=("ignore", "update"),
+        default="ignore",
+        help="Duplicate (timestamp, role) samples handling (default %(default)s)",
+    )
+    parser.add_argument(
+        "--acquisition-process",
+        action="store_true",
+        help="Read the photometer in a separate process through a shared memory ring",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=("rows", "steps"),
+        default="rows",
+        help="One row per sample or one compressed row per step (default %(default)s)",
+    )
+    parser.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        metavar="<FILE>",
+        help="Record the raw readings stream to this JSON Lines file",
+    )
+    replay = parser.add_mutually_exclusive_group()
+    replay.add_argument(
+        "--replay-session",
+        type=int,
+        default=None,
+        metavar="<ID>",
+        help="Replay a session from the database instead of reading a photometer",
+    )
+    replay.add_argument(
+        "--replay-file",
+        type=str,
+        default=None,
+        metavar="<FILE>",
+        help="Replay a recorded raw readings stream instead of reading a photometer",
+    )
+    parser.add_argument(
+        "--replay-role",
+        choices=("REF", "TEST"),
+        default="TEST",
+        help="Session role to replay (default %(default)s)",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        metavar="<N>",
+        help="Replay speed factor, 0 = unthrottled (default %(default)s)",
+    )
+    parser.add_argument(
+        "--serve",
+        type=str,
+        default=None,
+        metavar="<HOST:PORT>",
+        help="Broadcast readings and step statistics over WebSocket (/ws) and SSE (/events)",
+    )
+    parser.add_argument(
+        "--sql-trace",
+        type=float,
+        default=None,
+        metavar="<RATE>",
+        help="Log this fraction (0-1] of SQL statements with their duration",
+    )
+    parser.add_argument(
+        "--monochromator",
+        type=str,
+        default=None,
+        metavar="<PORT|sim>",
+        help="Drive the monochromator on this serial port, or a simulated one",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEF_SETTLE,
+        metavar="<SEC>",
+        help="Monochromator settle time after each move (default %(default)s)",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--bin-size",
+        type=int,
+        default=None,
+        metavar="<N>",
+        help="Save aggregates of every N readings instead of the readings",
+    )
+    group.add_argument(
+        "--bin-duration",
+        type=float,
+        default=None,
+        metavar="<SEC>",
+        help="Save aggregates of the readings in each SEC seconds instead of the readings",
+    )
+    parser.add_argument(
+        "--debug-window",
+        type=int,
+        default=0,
+        metavar="<N>",
+        help="When binning, also save the last N raw readings of each step (default %(default)s)",
+    )
     args = parser.parse_args(sys.argv[1:])
     configure_logging(args)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    listener = install_queue_logging()
+    if args.sql_trace:
+        SQLTrace(engine, args.sql_trace)
+    photometer = None
+    if args.replay_session is not None or args.replay_file is not None:
+        photometer = ReplayPhotometer(
+            AsyncSession,
+            session_id=args.replay_session,
+            role=Role[args.replay_role],
+            path=args.replay_file,
+            speed=args.replay_speed,
+        )
+        if args.acquisition_process:
+            log.warning("Acquisition process not available when replaying")
+            args.acquisition_process = False
+    broadcaster = None
+    if args.serve:
+        host, port = args.serve.rsplit(":", 1)
+        broadcaster = Broadcaster(host, int(port))
+    monochromator = None
+    if args.monochromator == "sim":
+        monochromator = SimulatedMonochromator(settle=args.settle)
+    elif args.monochromator:
+        monochromator = SerialMonochromator(args.monochromator, settle=args.settle)
     try:
-        controller = Controller(engine, AsyncSession)
+        controller = Controller(
+            engine,
+            AsyncSession,
+            trace=args.trace,
+            on_conflict=args.on_conflict,
+            acquisition=args.acquisition_process,
+            storage=args.storage,
+            photometer=photometer,
+            record=args.record,
+            broadcaster=broadcaster,
+            monochromator=monochromator,
+            bin_size=args.bin_size,
+            bin_duration=args.bin_duration,
+            debug_window=args.debug_window,
+        )
         tui = MyTextualApp(controller, DESCRIPTION)
         controller.set_view(tui)
         tui.run()
     except KeyboardInterrupt:
         log.warn("Application quits by user request")
+    finally:
+        listener.stop()
@@ -0,0 +1,186 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import sys
+import time
+import sqlite3
+import asyncio
+import logging
+
+from pathlib import Path
+
+# -------------------
+# Third party imports
+# -------------------
+
+from lica.textual.argparse import args_parser
+from lica.textual.logging import configure_logging
+from lica.sqlalchemy.asyncio.dbase import url, engine
+
+# --------------
+# local imports
+# -------------
+
+from . import __version__
+from .dbase.model import create_missing
+
+# ----------------
+# Module constants
+# ----------------
+
+DESCRIPTION = "Merge several bench databases into the working database"
+
+# 'WHERE true' avoids the parsing ambiguity of INSERT ... SELECT ... ON CONFLICT in SQLite
+COPY_PHOTOMETERS = """
+INSERT INTO main.photometer_t (name, mac, sensor, model, firmware, zero_point, freq_offset)
+SELECT name, mac, sensor, model, firmware, zero_point, freq_offset
+FROM src.photometer_t WHERE true
+ON CONFLICT (mac) DO NOTHING
+"""
+
+COPY_SAMPLES = """
+INSERT INTO main.samples_t (phot_id, tstamp, role, session, seq, mag, freq, temp_box, wave, filter)
+SELECT p.id, s.tstamp, s.role, s.session, s.seq, s.mag, s.freq, s.temp_box, s.wave, s.filter
+FROM src.samples_t AS s
+JOIN src.photometer_t AS sp ON s.phot_id = sp.id
+JOIN main.photometer_t AS p ON p.mac = sp.mac
+WHERE true
+ON CONFLICT (tstamp, role) DO NOTHING
+"""
+
+# steps_t has no unique constraint, so already merged steps are skipped explicitly
+COPY_STEPS = """
+INSERT INTO main.steps_t (phot_id, role, session, wave, filter, nsamples,
+    tstamp_first, tstamp_last, tstamps, seqs, mags, freqs, temps_box)
+SELECT p.id, s.role, s.session, s.wave, s.filter, s.nsamples,
+    s.tstamp_first, s.tstamp_last, s.tstamps, s.seqs, s.mags, s.freqs, s.temps_box
+FROM src.steps_t AS s
+JOIN src.photometer_t AS sp ON s.phot_id = sp.id
+JOIN main.photometer_t AS p ON p.mac = sp.mac
+WHERE NOT EXISTS (
+    SELECT 1 FROM main.steps_t AS m
+    WHERE m.session = s.session AND m.role = s.role AND m.phot_id = p.id
+    AND m.wave = s.wave AND m.tstamp_first = s.tstamp_first
+)
+"""
+
+# Same for bins_t
+COPY_BINS = """
+INSERT INTO main.bins_t (phot_id, role, session, wave, filter, count,
+    tstamp_first, tstamp_last, seq_first, seq_last,
+    freq_mean, freq_median, freq_stdev, mag_mean, temp_box_mean)
+SELECT p.id, b.role, b.session, b.wave, b.filter, b.count,
+    b.tstamp_first, b.tstamp_last, b.seq_first, b.seq_last,
+    b.freq_mean, b.freq_median, b.freq_stdev, b.mag_mean, b.temp_box_mean
+FROM src.bins_t AS b
+JOIN src.photometer_t AS sp ON b.phot_id = sp.id
+JOIN main.photometer_t AS p ON p.mac = sp.mac
+WHERE NOT EXISTS (
+    SELECT 1 FROM main.bins_t AS m
+    WHERE m.session = b.session AND m.role = b.role AND m.phot_id = p.id
+    AND m.wave = b.wave AND m.tstamp_first = b.tstamp_first
+)
+"""
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__.split(".")[-1])
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def inspect(path, check):
+    """Read only source database inspection, run in parallel for all sources"""
+    conn = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True)
+    try:
+        ok = conn.execute("PRAGMA quick_check").fetchone()[0] == "ok" if check else True
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        nsamples = conn.execute("SELECT count(*) FROM samples_t").fetchone()[0]
+    finally:
+        conn.close()
+    return ok, "steps_t" in tables, "bins_t" in tables, nsamples
+
+
+async def total_changes(conn):
+    return (await conn.exec_driver_sql("SELECT total_changes()")).scalar_one()
+
+
+async def copy(conn, path, has_steps, has_bins):
+    """Bulk copies a source database over ATTACH in a single transaction"""
+    await conn.exec_driver_sql("ATTACH DATABASE ? AS src", (str(path),))
+    try:
+        await conn.exec_driver_sql("BEGIN")
+        await conn.exec_driver_sql(COPY_PHOTOMETERS)
+        before = await total_changes(conn)
+        await conn.exec_driver_sql(COPY_SAMPLES)
+        samples = await total_changes(conn) - before
+        steps = 0
+        if has_steps:
+            before = await total_changes(conn)
+            await conn.exec_driver_sql(COPY_STEPS)
+            steps = await total_changes(conn) - before
+        bins = 0
+        if has_bins:
+            before = await total_changes(conn)
+            await conn.exec_driver_sql(COPY_BINS)
+            bins = await total_changes(conn) - before
+        await conn.exec_driver_sql("COMMIT")
+    except Exception:
+        await conn.exec_driver_sql("ROLLBACK")
+        raise
+    finally:
+        await conn.exec_driver_sql("DETACH DATABASE src")
+    return samples, steps, bins
+
+
+async def merge(paths, check):
+    t0 = time.perf_counter()
+    # SQLite allows a single writer, so only the source inspection runs in parallel
+    inspections = await asyncio.gather(*(asyncio.to_thread(inspect, p, check) for p in paths))
+    await create_missing(engine)
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for path, (ok, has_steps, has_bins, nsamples) in zip(paths, inspections):
+            if not ok:
+                log.error("Skipping %s: integrity check failed", path)
+                continue
+            t1 = time.perf_counter()
+            samples, steps, bins = await copy(conn, path, has_steps, has_bins)
+            log.info(
+                "Merged %s: %d of %d samples (%d duplicates skipped), %d steps, %d bins in %0.1f s",
+                path,
+                samples,
+                nsamples,
+                nsamples - samples,
+                steps,
+                bins,
+                time.perf_counter() - t1,
+            )
+        await conn.exec_driver_sql("ANALYZE")
+    await engine.dispose()
+    log.info("Merged %d databases in %0.1f s", len(paths), time.perf_counter() - t0)
+
+
+def main():
+    """The main entry point specified by pyproject.toml"""
+    parser = args_parser(name=__name__, version=__version__, description=DESCRIPTION)
+    parser.add_argument(
+        "sources", type=str, nargs="+", metavar="<DB>", help="Source SQLite database files"
+    )
+    parser.add_argument("--no-check", action="store_true", help="Skip the sources integrity check")
+    args = parser.parse_args(sys.argv[1:])
+    configure_logging(args)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    log.info("Merging %d databases into %s", len(args.sources), url)
+    asyncio.run(merge(args.sources, not args.no_check))
@@ -0,0 +1,172 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import asyncio
+import logging
+
+from abc import ABC, abstractmethod
+
+# -------------------
+# Third party imports
+# -------------------
+
+import aioserial
+
+# --------------
+# local imports
+# -------------
+
+from .wavelength import WaveLimit
+
+# ----------------
+# Module constants
+# ----------------
+
+DEF_BAUDRATE = 9600
+
+# Seconds for the grating position to stabilize after a move
+DEF_SETTLE = 0.5
+
+# Simulated grating slew rate in nm/s
+DEF_SLEW_RATE = 100.0
+
+# Position polling period while moving, in seconds
+POLL_PERIOD = 0.1
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------
+# Classes
+# -------
+
+
+class MonochromatorError(Exception):
+    pass
+
+
+class Monochromator(ABC):
+    """Async light source interface.
+    move() returns at once, leaving the grating moving and settling in the background,
+    so that the caller can overlap it with other work before awaiting settled()."""
+
+    def __init__(self, settle=DEF_SETTLE):
+        self.settle = settle
+        self.wavelength = None
+        self._target = None
+        self._motion = None
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        if self._motion is not None:
+            self._motion.cancel()
+
+    def move(self, wavelength):
+        wavelength = int(wavelength)
+        if not WaveLimit.MIN <= wavelength <= WaveLimit.MAX:
+            raise ValueError(f"Wavelength {wavelength} nm out of range")
+        if self._motion is not None:
+            if wavelength == self._target and self._on_track():
+                return
+            self._motion.cancel()
+        log.info("Moving to %d nm", wavelength)
+        self._target = wavelength
+        self._motion = asyncio.create_task(self._goto(wavelength))
+
+    async def settled(self):
+        """Waits until the last move has finished and settled"""
+        if self._motion is not None:
+            await self._motion
+
+    async def goto(self, wavelength):
+        self.move(wavelength)
+        await self.settled()
+
+    def _on_track(self):
+        """The last move is still running or has succeeded"""
+        motion = self._motion
+        return not motion.done() or (not motion.cancelled() and motion.exception() is None)
+
+    @abstractmethod
+    async def _goto(self, wavelength):
+        """Moves the grating to wavelength and waits for it to settle"""
+
+
+class SimulatedMonochromator(Monochromator):
+    """Models grating travel at a constant slew rate followed by a settle time"""
+
+    def __init__(self, settle=DEF_SETTLE, slew_rate=DEF_SLEW_RATE):
+        super().__init__(settle)
+        self.slew_rate = slew_rate
+
+    async def _goto(self, wavelength):
+        start = self.wavelength if self.wavelength is not None else WaveLimit.MIN
+        await asyncio.sleep(abs(wavelength - start) / self.slew_rate + self.settle)
+        self.wavelength = wavelength
+        log.info("Settled at %d nm", wavelength)
+
+
+class SerialMonochromator(Monochromator):
+    """Newport Cornerstone like ASCII protocol: commands end with CR LF
+    and are echoed back, queries answer with an additional line"""
+
+    def __init__(self, port, baudrate=DEF_BAUDRATE, settle=DEF_SETTLE):
+        super().__init__(settle)
+        self._port = port
+        self._baudrate = baudrate
+        self._serial = None
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        self._serial = aioserial.AioSerial(port=self._port, baudrate=self._baudrate, timeout=2)
+        self.wavelength = round(float(await self._query("WAVE?")))
+        self._target = self.wavelength
+        log.info("Monochromator on %s at %d nm", self._port, self.wavelength)
+
+    async def close(self):
+        await super().close()
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    async def _readline(self):
+        line = await self._serial.readline_async()
+        if not line:
+            raise MonochromatorError(f"Timeout reading from {self._port}")
+        return line.decode("ascii").strip()
+
+    async def _exchange(self, line, nlines):
+        async with self._lock:
+            await self._serial.write_async(f"{line}\r\n".encode("ascii"))
+            return [await self._readline() for _ in range(nlines)]
+
+    async def _command(self, command):
+        # Shielded so that a move cancelled mid command still reads its echo,
+        # which would otherwise be taken as the answer to the next one
+        (echo,) = await asyncio.shield(self._exchange(command, 1))
+        if echo != command:
+            raise MonochromatorError(f"Unexpected echo {echo!r} to {command!r}")
+
+    async def _query(self, query):
+        _, answer = await asyncio.shield(self._exchange(query, 2))
+        return answer
+
+    async def _goto(self, wavelength):
+        await self._command(f"GOWAVE {wavelength}")
+        while abs(float(await self._query("WAVE?")) - wavelength) >= 0.5:
+            await asyncio.sleep(POLL_PERIOD)
+        await asyncio.sleep(self.settle)
+        self.wavelength = wavelength
+        log.info("Settled at %d nm", wavelength)
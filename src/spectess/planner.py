@@ -0,0 +1,200 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import logging
+
+from collections import namedtuple
+
+# -------------------
+# Third party imports
+# -------------------
+
+# --------------
+# local imports
+# -------------
+
+from .wavelength import compute_filter
+from .monochromator import DEF_SETTLE
+
+# ----------------
+# Module constants
+# ----------------
+
+# Default cost model figures, in seconds
+DEF_READING_PERIOD = 1.0  # Photometer reading period
+DEF_SLEW_RATE = 100.0  # Monochromator travel in nm/s
+DEF_OVERHEAD = 0.5  # Statistics and saving after each step
+DEF_FILTER_SWAP = 30.0  # Manual filter change
+DEF_ROLE_SWAP = 60.0  # Manual REF / TEST photometer change
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+PlanStep = namedtuple("PlanStep", ["role", "wavelength", "filter"])
+
+# -------
+# Classes
+# -------
+
+
+class CostModel:
+    """Dead time between sweep steps. Monochromator moves are issued when the last
+    reading of a step arrives, so they overlap with statistics and saving,
+    while filter and photometer changes are manual and add up"""
+
+    def __init__(
+        self,
+        nsamples,
+        reading_period=DEF_READING_PERIOD,
+        slew_rate=DEF_SLEW_RATE,
+        settle=DEF_SETTLE,
+        overhead=DEF_OVERHEAD,
+        filter_swap=DEF_FILTER_SWAP,
+        role_swap=DEF_ROLE_SWAP,
+    ):
+        self.nsamples = nsamples
+        self.reading_period = reading_period
+        self.slew_rate = slew_rate
+        self.settle = settle
+        self.overhead = overhead
+        self.filter_swap = filter_swap
+        self.role_swap = role_swap
+
+    def capture(self, step):
+        return self.nsamples * self.reading_period
+
+    def transition(self, prev, step):
+        move = 0.0
+        if prev.wavelength != step.wavelength:
+            move = abs(step.wavelength - prev.wavelength) / self.slew_rate + self.settle
+        dead = max(move, self.overhead)
+        if prev.filter != step.filter:
+            dead += self.filter_swap
+        if prev.role != step.role:
+            dead += self.role_swap
+        return dead
+
+
+class Plan:
+    def __init__(self, name, steps, cost):
+        self.name = name
+        self.steps = steps
+        self.duration = estimate(steps, cost)
+        self.filter_swaps = sum(1 for a, b in zip(steps, steps[1:]) if a.filter != b.filter)
+        self.role_swaps = sum(1 for a, b in zip(steps, steps[1:]) if a.role != b.role)
+
+    def __repr__(self) -> str:
+        return f"Plan(name={self.name!r}, steps={len(self.steps)}, duration={self.duration:0.0f})"
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __getitem__(self, i):
+        return self.steps[i]
+
+    def summary(self):
+        return (
+            f"{len(self.steps)} steps ({self.name}), {self.filter_swaps} filter changes, "
+            f"{self.role_swaps} photometer changes, estimated {hms(self.duration)}"
+        )
+
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def hms(seconds):
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m {seconds:02d}s"
+
+
+def estimate(steps, cost):
+    """Total sweep duration in seconds, including the final overhead"""
+    if not steps:
+        return 0.0
+    total = sum(cost.capture(step) for step in steps) + cost.overhead
+    total += sum(cost.transition(a, b) for a, b in zip(steps, steps[1:]))
+    return total
+
+
+def _groups(wavelengths, filter_of):
+    """Ascending wavelengths split into runs sharing the same filter"""
+    groups = list()
+    for wave in sorted(set(wavelengths)):
+        filt = filter_of(wave)
+        if groups and groups[-1][0] == filt:
+            groups[-1][1].append(wave)
+        else:
+            groups.append((filt, [wave]))
+    return groups
+
+
+def _serpentine(runs):
+    """Alternates the direction of consecutive runs so that each starts where the previous ended"""
+    return [run if i % 2 == 0 else run[::-1] for i, run in enumerate(runs)]
+
+
+def candidates(wavelengths, roles, filter_of=compute_filter):
+    """Yields (name, steps) sweep orderings"""
+    groups = _groups(wavelengths, filter_of)
+    ascending = [(filt, wave) for filt, waves in groups for wave in waves]
+    roles = list(roles)
+
+    # One ascending sweep per role, as done by hand
+    yield (
+        "naive",
+        [PlanStep(role, wave, filt) for role in roles for filt, wave in ascending],
+    )
+    # One sweep per role, alternating direction
+    yield (
+        "role major",
+        [
+            PlanStep(role, wave, filt)
+            for role, run in zip(roles, _serpentine([ascending] * len(roles)))
+            for filt, wave in run
+        ],
+    )
+    # All roles at each wavelength, alternating the role order
+    yield (
+        "wave major",
+        [
+            PlanStep(role, wave, filt)
+            for (filt, wave), order in zip(ascending, _serpentine([roles] * len(ascending)))
+            for role in order
+        ],
+    )
+    # Within each filter, one sweep per role, alternating both the direction and the role order
+    steps = list()
+    order = roles
+    for filt, waves in groups:
+        runs = _serpentine([waves] * len(order))
+        if steps:
+            # Start the group at the end closest to the current position
+            last = steps[-1].wavelength
+            if abs(last - runs[0][0]) > abs(last - runs[0][-1]):
+                runs = [run[::-1] for run in runs]
+        for role, run in zip(order, runs):
+            steps.extend(PlanStep(role, wave, filt) for wave in run)
+        # The next group starts with the photometer in place
+        order = order[::-1]
+    yield "filter major", steps
+
+
+def plan(wavelengths, roles, cost, filter_of=compute_filter):
+    """Cheapest ordering of all (role, wavelength) steps, and the naive one for comparison"""
+    plans = [Plan(name, steps, cost) for name, steps in candidates(wavelengths, roles, filter_of)]
+    for p in plans:
+        log.debug("Candidate %s", p)
+    return min(plans, key=lambda p: p.duration), plans[0]
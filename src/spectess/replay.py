@@ -0,0 +1,181 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import math
+import json
+import asyncio
+import logging
+
+from datetime import datetime, timezone
+
+# -------------------
+# Third party imports
+# -------------------
+
+from sqlalchemy import select
+
+from lica.asyncio.photometer import Role
+
+# --------------
+# local imports
+# -------------
+
+from .dbase.model import Sample, Step, Photometer
+from .dbase.blob import expand_step
+
+# ----------------
+# Module constants
+# ----------------
+
+# Readings buffered ahead of the consumer
+QUEUE_SIZE = 1
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def dump_reading(msg) -> str:
+    """Photometer reading as a JSON line, for raw stream recording"""
+    return json.dumps({**msg, "tstamp": msg["tstamp"].isoformat()}, default=str) + "\n"
+
+
+def load_readings(path):
+    with open(path) as fd:
+        return [
+            {**record, "tstamp": datetime.fromisoformat(record["tstamp"])}
+            for record in map(json.loads, fd)
+        ]
+
+
+# -------
+# Classes
+# -------
+
+
+class ReplayPhotometer:
+    """Feeds recorded readings with the same queue / readings() interface of lica photometers.
+    Readings come from a session role in the database or from a recorded raw stream file,
+    and are paced at real time (speed=1), N times faster (speed=N) or unthrottled (speed=0).
+    Successive readings() calls resume where the consumer stopped."""
+
+    def __init__(
+        self, session_class, session_id=None, role=Role.TEST, path=None, speed=1.0, restamp=True
+    ):
+        self.session_class = session_class
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self._session_id = session_id
+        self._role = role
+        self._path = path
+        self._speed = speed
+        self._restamp = restamp
+        self._readings = None
+        self._cursor = 0
+        self._shift = None
+
+    def clear(self):
+        """Discards queued readings, which will be replayed again"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self._cursor -= 1
+
+    async def get_info(self):
+        if self._path is not None:
+            return {
+                "name": "replay",
+                "mac": "00:00:00:00:00:00",
+                "sensor": "replay",
+                "model": "replay",
+                "firmware": str(self._path),
+                "zp": 20.50,
+                "freq_offset": 0.0,
+            }
+        async with self.session_class() as session:
+            async with session.begin():
+                q = (
+                    select(Photometer)
+                    .join(Photometer.samples)
+                    .where(Sample.session == self._session_id, Sample.role == self._role.tag())
+                    .limit(1)
+                )
+                phot = (await session.scalars(q)).one_or_none()
+                if phot is None:
+                    q = (
+                        select(Photometer)
+                        .join(Photometer.steps)
+                        .where(Step.session == self._session_id, Step.role == self._role.tag())
+                        .limit(1)
+                    )
+                    phot = (await session.scalars(q)).one()
+        return {
+            "name": phot.name,
+            "mac": phot.mac,
+            "sensor": phot.sensor,
+            "model": phot.model,
+            "firmware": phot.firmware,
+            "zp": phot.zero_point,
+            "freq_offset": phot.freq_offset,
+        }
+
+    async def _load(self):
+        if self._path is not None:
+            return load_readings(self._path)
+        async with self.session_class() as session:
+            async with session.begin():
+                q = select(
+                    Sample.tstamp, Sample.seq, Sample.freq, Sample.mag, Sample.temp_box
+                ).where(Sample.session == self._session_id, Sample.role == self._role.tag())
+                records = list((await session.execute(q)).all())
+                q = select(Step).where(
+                    Step.session == self._session_id, Step.role == self._role.tag()
+                )
+                for step in (await session.scalars(q)).all():
+                    records.extend(
+                        (tstamp, seq, freq, mag, temp_box)
+                        for tstamp, seq, mag, freq, temp_box in expand_step(step)
+                    )
+        records.sort(key=lambda record: record[0])
+        # Sky temperature is not stored
+        return [
+            dict(tstamp=tstamp, seq=seq, freq=freq, mag=mag, tamb=tamb, tsky=math.nan)
+            for tstamp, seq, freq, mag, tamb in records
+        ]
+
+    async def readings(self):
+        """Producer coroutine"""
+        if self._readings is None:
+            self._readings = await self._load()
+            log.info("Replaying %d readings at speed %s", len(self._readings), self._speed)
+            if self._readings:
+                # Shift the recorded timeline to the present, keeping timestamps unique
+                first = self._readings[0]["tstamp"]
+                now = datetime.now(timezone.utc).replace(tzinfo=first.tzinfo)
+                self._shift = now - first
+        loop = asyncio.get_running_loop()
+        start = self._cursor
+        t0 = loop.time()
+        while self._cursor < len(self._readings):
+            msg = self._readings[self._cursor]
+            if self._speed > 0:
+                elapsed = (msg["tstamp"] - self._readings[start]["tstamp"]).total_seconds()
+                delay = t0 + elapsed / self._speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if self._restamp:
+                msg = {**msg, "tstamp": msg["tstamp"] + self._shift}
+            await self.queue.put(msg)
+            self._cursor += 1
+        log.warning("Replay finished after %d readings", self._cursor)
@@ -9,6 +9,7 @@
 # -------------------
 
 import math
+import array
 import logging
 import statistics
 import collections
@@ -38,28 +39,95 @@ log = logging.getLogger(__name__)
 
 
 class RingBuffer:
-    def __init__(self, capacity=75, zp=20.50, fo=0.0):
-        self._buffer = collections.deque([], capacity)
+    """Readings of a wavelength step.
+    In the binning mode, consecutive readings are aggregated in bins of bin_size readings
+    or bin_duration seconds. Only the frequencies are kept for the step statistics,
+    together with the last debug_window raw readings."""
+
+    def __init__(
+        self, capacity=75, zp=20.50, fo=0.0, bin_size=None, bin_duration=None, debug_window=0
+    ):
         self._zp = zp
         self._fo = fo
+        self._bin_size = bin_size
+        self._bin_duration = bin_duration
+        self._binning = bin_size is not None or bin_duration is not None
+        if self._binning:
+            self._buffer = collections.deque([], debug_window)
+            self._freqs = array.array("d")
+            self._bin = list()
+            self._bins = list()
+        else:
+            self._buffer = collections.deque([], capacity)
 
     def __len__(self):
-        return len(self._buffer)
+        return len(self._freqs) if self._binning else len(self._buffer)
+
+    @property
+    def binning(self):
+        return self._binning
 
     def pop(self):
         return self._buffer.popleft()
 
     def append(self, item):
+        if not self._binning:
+            self._buffer.append(item)
+            return
         self._buffer.append(item)
+        self._freqs.append(item["freq"])
+        if (
+            self._bin
+            and self._bin_duration is not None
+            and (item["tstamp"] - self._bin[0]["tstamp"]).total_seconds() >= self._bin_duration
+        ):
+            self._close_bin()
+        self._bin.append(item)
+        if self._bin_size is not None and len(self._bin) >= self._bin_size:
+            self._close_bin()
+
+    def _close_bin(self):
+        frequencies = [item["freq"] for item in self._bin]
+        mean = statistics.fmean(frequencies)
+        self._bins.append(
+            {
+                "count": len(self._bin),
+                "tstamp_first": self._bin[0]["tstamp"],
+                "tstamp_last": self._bin[-1]["tstamp"],
+                "seq_first": self._bin[0]["seq"],
+                "seq_last": self._bin[-1]["seq"],
+                "freq_mean": mean,
+                "freq_median": statistics.median_low(frequencies),
+                "freq_stdev": statistics.stdev(frequencies, mean) if len(frequencies) > 1 else 0.0,
+                "mag_mean": statistics.fmean(item["mag"] for item in self._bin),
+                "temp_box_mean": statistics.fmean(item["tamb"] for item in self._bin),
+            }
+        )
+        self._bin = list()
+
+    def pop_bins(self):
+        """Closes the current partial bin and returns all bins aggregated so far"""
+        if self._bin:
+            self._close_bin()
+        bins, self._bins = self._bins, list()
+        return bins
+
+    def pop_debug(self):
+        """Raw readings in the debug window"""
+        readings = list(self._buffer)
+        self._buffer.clear()
+        return readings
 
     def magnitude(self, f):
         return self._zp - 2.5 * math.log10(f - self._fo)
 
     def frequencies(self):
+        if self._binning:
+            return self._freqs.tolist()
         return [item["freq"] for item in self._buffer]
 
     def statistics(self):
-        frequencies = [item["freq"] for item in self._buffer]
+        frequencies = self.frequencies()
         median = statistics.median_low(frequencies)
         aver = statistics.fmean(frequencies)
         stdev = statistics.stdev(frequencies, aver)
@@ -0,0 +1,177 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import json
+import asyncio
+import logging
+
+from pathlib import Path
+
+# -------------------
+# Third party imports
+# -------------------
+
+import numpy as np
+
+from sqlalchemy import select
+
+# --------------
+# local imports
+# -------------
+
+from .dbase.model import Sample, Step
+from .dbase.blob import to_micros, unpack, unpack_delta
+
+# ----------------
+# Module constants
+# ----------------
+
+# One record per sample. Timestamps in microseconds since the epoch (see dbase.blob)
+DTYPE = np.dtype(
+    [
+        ("tstamp", "<i8"),
+        ("seq", "<i8"),
+        ("wave", "<i8"),
+        ("freq", "<f8"),
+        ("mag", "<f8"),
+        ("temp_box", "<f8"),
+    ]
+)
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__)
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def paths(directory, session_id):
+    directory = Path(directory)
+    return directory / f"session_{session_id}.npy", directory / f"session_{session_id}.json"
+
+
+def role_key(role):
+    """Role tag as stored in the database, from a Role or a string"""
+    return role.tag() if hasattr(role, "tag") else str(role)
+
+
+async def load_session(session_class, session_id):
+    """Loads all samples of a session, in both storage layouts, as structured arrays per role"""
+    chunks = dict()
+    async with session_class() as session:
+        async with session.begin():
+            q = select(
+                Sample.role,
+                Sample.tstamp,
+                Sample.seq,
+                Sample.wave,
+                Sample.freq,
+                Sample.mag,
+                Sample.temp_box,
+            ).where(Sample.session == session_id)
+            rows = (await session.execute(q)).all()
+            q = select(Step).where(Step.session == session_id)
+            steps = (await session.scalars(q)).all()
+    by_role = dict()
+    for role, *values in rows:
+        by_role.setdefault(role, list()).append((to_micros(values[0]), *values[1:]))
+    for role, records in by_role.items():
+        chunks.setdefault(role, list()).append(np.array(records, dtype=DTYPE))
+    for step in steps:
+        chunk = np.empty(step.nsamples, dtype=DTYPE)
+        chunk["tstamp"] = unpack_delta(step.tstamps)
+        chunk["seq"] = unpack_delta(step.seqs)
+        chunk["wave"] = step.wave
+        chunk["freq"] = unpack(step.freqs)
+        chunk["mag"] = unpack(step.mags)
+        chunk["temp_box"] = unpack(step.temps_box)
+        chunks.setdefault(step.role, list()).append(chunk)
+    return {role: np.concatenate(arrays) for role, arrays in chunks.items()}
+
+
+def write_archive(directory, session_id, arrays, watermark=None):
+    """Writes per role structured arrays as a single .npy file sorted by
+    (role, wave, tstamp), plus a JSON index of (start, end) record ranges.
+    The watermark identifies the database contents the archive was made from."""
+    data_path, index_path = paths(directory, session_id)
+    index = {"session": session_id, "watermark": watermark, "roles": dict()}
+    parts = list()
+    offset = 0
+    for role in sorted(arrays):
+        array = arrays[role]
+        array = array[np.lexsort((array["tstamp"], array["wave"]))]
+        waves, start, count = np.unique(array["wave"], return_index=True, return_counts=True)
+        index["roles"][role] = {
+            "range": [offset, offset + array.size],
+            "waves": {
+                str(w): [offset + int(s), offset + int(s + c)]
+                for w, s, c in zip(waves.tolist(), start, count)
+            },
+        }
+        parts.append(array)
+        offset += array.size
+    data = np.concatenate(parts) if parts else np.empty(0, dtype=DTYPE)
+    np.save(data_path, data)
+    with open(index_path, "w") as fd:
+        json.dump(index, fd)
+    log.info("Archived %d samples of session %s in %s", data.size, session_id, data_path)
+    return data_path
+
+
+async def archive_session(session_class, session_id, directory, watermark=None):
+    arrays = await load_session(session_class, session_id)
+    # Sorting and writing a large session would otherwise stall the event loop
+    return await asyncio.to_thread(write_archive, directory, session_id, arrays, watermark)
+
+
+def archived(directory, session_id):
+    return all(path.exists() for path in paths(directory, session_id))
+
+
+# -------
+# Classes
+# -------
+
+
+class SessionArchive:
+    """Read only, memory mapped access to an archived session.
+    All selections are zero-copy views on the mapped file."""
+
+    def __init__(self, directory, session_id):
+        data_path, index_path = paths(directory, session_id)
+        with open(index_path) as fd:
+            self._index = json.load(fd)
+        self.data = np.load(data_path, mmap_mode="r")
+        self.session_id = session_id
+        watermark = self._index.get("watermark")
+        self.watermark = tuple(watermark) if watermark is not None else None
+
+    def roles(self):
+        return tuple(self._index["roles"])
+
+    def waves(self, role):
+        return tuple(int(w) for w in self._index["roles"][role_key(role)]["waves"])
+
+    def select(self, role, wave=None):
+        """Samples of a role, optionally at a single wavelength, ordered by (wave, tstamp)"""
+        entry = self._index["roles"].get(role_key(role))
+        if entry is None:
+            return self.data[0:0]
+        start, end = entry["range"] if wave is None else entry["waves"].get(str(wave), (0, 0))
+        return self.data[start:end]
+
+    def arrays(self, role):
+        """(wave, freq) views of a role, as expected by analysis.spectral_response()"""
+        samples = self.select(role)
+        return samples["wave"], samples["freq"]
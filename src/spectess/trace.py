@@ -0,0 +1,162 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+import sys
+import json
+import time
+import logging
+import statistics
+import collections
+
+# -------------------
+# Third party imports
+# -------------------
+
+from lica.textual.argparse import args_parser
+from lica.textual.logging import configure_logging
+
+# --------------
+# local imports
+# -------------
+
+from . import __version__
+
+# ----------------
+# Module constants
+# ----------------
+
+DESCRIPTION = "SpecTESS sweep timeline trace analyzer"
+
+# -----------------------
+# Module global variables
+# -----------------------
+
+log = logging.getLogger(__name__.split(".")[-1])
+
+# -------
+# Classes
+# -------
+
+
+class Tracer:
+    """Per wavelength step timeline trace, appended as JSON Lines to a file.
+    A Tracer without path does nothing, so that it can be always called."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._record = None
+
+    def begin(self, session_id, role, wavelength, filt, nsamples):
+        if self._path is None:
+            return
+        self._record = {
+            "session_id": session_id,
+            "role": role,
+            "wavelength": wavelength,
+            "filter": filt,
+            "nsamples": nsamples,
+            "events": {"pressed": time.time()},
+            "ui": 0.0,
+        }
+
+    def mark(self, event):
+        if self._record is not None:
+            self._record["events"][event] = time.time()
+
+    def reading(self):
+        if self._record is not None:
+            now = time.time()
+            self._record["events"].setdefault("first_reading", now)
+            self._record["events"]["last_reading"] = now
+
+    def ui(self, elapsed):
+        """Accumulates time spent updating the view while receiving readings"""
+        if self._record is not None:
+            self._record["ui"] += elapsed
+
+    def end(self):
+        if self._record is None:
+            return
+        with open(self._path, "a") as fd:
+            fd.write(json.dumps(self._record) + "\n")
+        self._record = None
+
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def _span(events, start, end):
+    if start in events and end in events:
+        return events[end] - events[start]
+    return None
+
+
+def phases(record):
+    """Split a step trace record into its phases, in seconds"""
+    events = record["events"]
+    device = _span(events, "first_reading", "last_reading")
+    start = "settled" if "settled" in events else "pressed"
+    return {
+        "settle": _span(events, "pressed", "settled"),
+        "startup": _span(events, start, "first_reading"),
+        "device": device - record["ui"] if device is not None else None,
+        "ui": record["ui"],
+        "stats": _span(events, "last_reading", "stats"),
+        "db": _span(events, "save_begin", "save_commit"),
+        "advance": _span(events, "save_commit", "advance"),
+        "total": _span(events, "pressed", "advance") or _span(events, "pressed", "stats"),
+    }
+
+
+def analyze(path, session_id=None):
+    """Returns per session a dictionary of phase name to list of durations"""
+    sessions = collections.defaultdict(lambda: collections.defaultdict(list))
+    with open(path) as fd:
+        for line in fd:
+            record = json.loads(line)
+            if session_id is not None and record["session_id"] != session_id:
+                continue
+            for phase, value in phases(record).items():
+                if value is not None:
+                    sessions[record["session_id"]][phase].append(value)
+    return sessions
+
+
+def report(sessions):
+    for session_id, durations in sessions.items():
+        total = sum(durations["total"])
+        log.info("Session %s: %d steps in %0.3f s", session_id, len(durations["total"]), total)
+        for phase, values in durations.items():
+            if phase == "total":
+                continue
+            spent = sum(values)
+            share = 100 * spent / total if total else 0.0
+            log.info(
+                "  %-8s total = %9.3f s (%5.1f%%), median = %0.4f s, max = %0.4f s",
+                phase,
+                spent,
+                share,
+                statistics.median(values),
+                max(values),
+            )
+
+
+def main():
+    """The main entry point specified by pyproject.toml"""
+    parser = args_parser(name=__name__, version=__version__, description=DESCRIPTION)
+    parser.add_argument("trace", type=str, metavar="<FILE>", help="JSON Lines trace file")
+    parser.add_argument(
+        "-s", "--session", type=int, default=None, metavar="<ID>", help="Analyze only this session"
+    )
+    args = parser.parse_args(sys.argv[1:])
+    configure_logging(args)
+    report(analyze(args.trace, args.session))
@@ -45,6 +45,7 @@ from textual.widgets import (
     RadioButton,
     DirectoryTree,
     OptionList,
+    SelectionList,
 )
 
 from textual.containers import Horizontal, Vertical
@@ -59,6 +60,8 @@ from lica.asyncio.photometer import Role
 
 from .. import __version__
 from .widgets.wavelength import Wavelength
+from .widgets.plot import FrequencyPlot
+from ..jobs import JobClass
 
 # ----------------
 # Module constants
@@ -72,6 +75,24 @@ CSS_PATH = os.path.join(os.getcwd(), CSS_FILE)
 ABOUT_PKG = "spectess.tui.resources.about"
 ABOUT_RES = "description.md"
 
+RESPONSE_COLUMNS = (
+    "\u03bb (nm)",
+    "REF N",
+    "REF median",
+    "REF \u03c3",
+    "TEST N",
+    "TEST median",
+    "TEST \u03c3",
+    "Ratio",
+    "Ratio err",
+    "Norm.",
+    "Norm. err",
+)
+
+JOBS_COLUMNS = ("Id", "Job", "Class", "State", "Progress", "Elapsed (s)")
+# Jobs table refresh period [s]
+JOBS_REFRESH = 0.5
+
 DEFAULT_CSS = files(CSS_PKG).joinpath(CSS_FILE).read_text()
 ABOUT = files(ABOUT_PKG).joinpath(ABOUT_RES).read_text()
 
@@ -121,6 +142,9 @@ class MyTextualApp(App[str]):
                 yield Input(placeholder="Starting Wavelength [nm]", id="wavelength", type="integer")
                 yield Input(placeholder="Wavelength increment [nm]", id="wave_incr", type="integer")
                 yield Input(placeholder="Number of samples", id="nsamples", type="integer")
+                with Horizontal(id="plan_container"):
+                    yield Button("Plan sweep", id="plan_button", variant="primary")
+                    yield Label(id="plan_summary")
             with TabPane("Capture", id="capture_tab"):
                 with Horizontal(id="capture_div"):
                     with Vertical(id="capture_controls_container"):
@@ -148,7 +172,9 @@ class MyTextualApp(App[str]):
                             "Capture", id="capture_button", variant="primary", disabled=True
                         )
                     yield Rule(orientation="vertical", classes="vertical_separator")
-                    yield DataTable(id="phot_info_table")
+                    with Vertical(id="phot_info_container"):
+                        yield DataTable(id="phot_info_table")
+                        yield FrequencyPlot(id="freq_plot")
                 yield Log(id="log", classes="log")
             with TabPane("Export", id="export_tab"):
                 with Horizontal():
@@ -161,7 +187,29 @@ class MyTextualApp(App[str]):
                             yield Checkbox("Test", id="tst_session", disabled=True)
                         yield Input(placeholder="Directory", id="directory")
                         yield Input(placeholder="File name", id="filename")
-                        yield Button("Export", id="export_button")
+                        with Horizontal(id="paired_container"):
+                            yield Checkbox("Paired REF/TEST", id="paired_export")
+                            yield Input(placeholder="Tolerance [s]", id="tolerance", type="number")
+                        with RadioSet(id="export_mode"):
+                            yield RadioButton("Full", id="full_export", value=True)
+                            yield RadioButton("Append new", id="append_export")
+                            yield RadioButton("Delta file", id="delta_export")
+                        with Horizontal(id="export_buttons"):
+                            yield Button("Export", id="export_button")
+                            yield Button("Archive (.npy)", id="archive_button")
+            with TabPane("Batch Export", id="batch_tab"):
+                yield SelectionList[str](id="batch_sessions")
+                with Horizontal(id="batch_buttons"):
+                    yield Button("Select all", id="batch_all_button")
+                    yield Button("Export selected", id="batch_export_button", variant="primary")
+            with TabPane("Response", id="response_tab"):
+                with Horizontal(id="response_controls"):
+                    yield Button("Compute", id="compute_button", variant="primary")
+                    yield Button("Export", id="export_response_button")
+                yield DataTable(id="response_table")
+            with TabPane("Jobs", id="jobs_tab"):
+                yield DataTable(id="jobs_table", cursor_type="row")
+                yield Button("Cancel job", id="cancel_job_button", variant="error")
         yield Footer()
 
     def on_mount(self) -> None:
@@ -192,6 +240,7 @@ class MyTextualApp(App[str]):
         self.switch_w.border_title = "OFF / ON"
         self.phot_info_table_w = self.query_one("#phot_info_table")
         self.cur_wave_w = self.query_one("#cur_wave")
+        self.plot_w = self.query_one("#freq_plot")
         self.save_w = self.query_one("#save_radio")
         self.save_w.value = self.controller.save
         self.progress_w = self.query_one("#progress_phot")
@@ -205,8 +254,31 @@ class MyTextualApp(App[str]):
         self.filename_w = self.query_one("#filename")
         self.filename_w.border_title = "File Name"
         self.filename_w.value = self.controller.filename
+        self.tolerance_w = self.query_one("#tolerance")
+        self.tolerance_w.border_title = "As-of tolerance (s)"
+        self.tolerance_w.value = self.controller.tolerance
+        self.query_one("#export_mode").border_title = "Export mode"
         self.session_list_w = self.query_one("#session_list")
         self.session_list_w.border_title = "Avail. Sessions"
+        # ----------------
+        # Batch Export Tab
+        # ----------------
+        self.batch_list_w = self.query_one("#batch_sessions")
+        self.batch_list_w.border_title = "Sessions (one file each in the export directory)"
+        # ------------
+        # Response Tab
+        # ------------
+        self.response_table_w = self.query_one("#response_table")
+        self.response_table_w.add_columns(*RESPONSE_COLUMNS)
+        self.response_table_w.border_title = "Spectral Response (selected session)"
+        # --------
+        # Jobs Tab
+        # --------
+        self.jobs_table_w = self.query_one("#jobs_table")
+        self.jobs_table_w.add_columns(*JOBS_COLUMNS)
+        self.jobs_table_w.border_title = "Jobs"
+        self._job_ids = list()
+        self.set_interval(JOBS_REFRESH, self._refresh_jobs)
         # Finish asynchronous initialization in a separate worker
         self.run_worker(self._async_initialization(), exclusive=True)
 
@@ -215,7 +287,10 @@ class MyTextualApp(App[str]):
     # --------------
 
     async def _async_initialization(self):
-        self.session_list_w.add_options(await self.controller.get_sessions())
+        await self.controller.start_services()
+        sessions = await self.controller.get_sessions()
+        self.session_list_w.add_options(sessions)
+        self.update_batch_sessions(sessions)
         nsamples = await self.controller.get_nsamples()
         start_wave = await self.controller.get_start_wavelength()
         wave_incr = await self.controller.get_wave_incr()
@@ -226,6 +301,25 @@ class MyTextualApp(App[str]):
         self.progress_w.total = int(nsamples)
         self.nsamples_w.value = nsamples
 
+    def _refresh_jobs(self):
+        jobs = self.controller.jobs.jobs()
+        cursor = self.jobs_table_w.cursor_row
+        self.jobs_table_w.clear()
+        self._job_ids = [job.id for job in jobs]
+        self.jobs_table_w.add_rows(
+            (
+                str(job.id),
+                job.name,
+                str(job.job_class),
+                str(job.state),
+                job.progress_text(),
+                f"{job.elapsed:0.1f}",
+            )
+            for job in jobs
+        )
+        if jobs:
+            self.jobs_table_w.move_cursor(row=min(cursor, len(jobs) - 1))
+
     # =============================
     # API exposed to the Controller
     # =============================
@@ -249,9 +343,28 @@ class MyTextualApp(App[str]):
     def reset_progress(self):
         self.progress_w.progress = 0
 
+    def reset_plot(self):
+        self.plot_w.reset_step()
+
+    def plot_reading(self, freq):
+        self.plot_w.add_reading(freq)
+
+    def plot_median(self, role, wavelength, median):
+        self.plot_w.add_median(role, wavelength, median)
+
     def set_start_wavelength(self, value):
         self.start_wave_w.value = str(value)
 
+    def update_batch_sessions(self, sessions):
+        self.batch_list_w.clear_options()
+        self.batch_list_w.add_options((session, session) for session in sessions)
+
+    def set_role(self, role):
+        self.query_one("#ref_role" if role is Role.REF else "#tst_role").value = True
+
+    def show_plan(self, text):
+        self.query_one("#plan_summary").update(text)
+
     def set_wavelength(self, value):
         self.cur_wave_w.wavelength = f"{value:>8}"
 
@@ -276,6 +389,13 @@ class MyTextualApp(App[str]):
         self.query_one("#tst_session").value = False
         self.query_one("#ref_session").value = False
 
+    def update_response_table(self, rows):
+        self.response_table_w.clear()
+        self.response_table_w.add_rows(
+            tuple(f"{value:0.4f}" if isinstance(value, float) else str(value) for value in row)
+            for row in rows
+        )
+
     def update_roles_in_session(self, roles):
         for role in roles:
             if role is Role.TEST:
@@ -293,6 +413,9 @@ class MyTextualApp(App[str]):
     def action_about(self):
         self.push_screen(About(self.TITLE, version=__version__, description=ABOUT))
 
+    async def on_unmount(self) -> None:
+        await self.controller.stop_services()
+
     # ----------------------------
     # Workers single event handler
     # ----------------------------
@@ -308,15 +431,29 @@ class MyTextualApp(App[str]):
 
     @on(Input.Submitted, "#nsamples")
     def nsamples(self, event: Input.Submitted) -> None:
-        self.run_worker(self.controller.set_nsamples(event.control.value), exclusive=True)
+        self.controller.submit(
+            "set nsamples", JobClass.MAINTENANCE, self.controller.set_nsamples(event.control.value)
+        )
 
     @on(Input.Submitted, "#wavelength")
     def wavelength(self, event: Input.Submitted) -> None:
-        self.run_worker(self.controller.set_start_wavelength(event.control.value), exclusive=True)
+        self.controller.submit(
+            "set start wavelength",
+            JobClass.MAINTENANCE,
+            self.controller.set_start_wavelength(event.control.value),
+        )
 
     @on(Input.Submitted, "#wave_incr")
     def wave_incr(self, event: Input.Submitted) -> None:
-        self.run_worker(self.controller.set_wave_incr(event.control.value), exclusive=True)
+        self.controller.submit(
+            "set wavelength increment",
+            JobClass.MAINTENANCE,
+            self.controller.set_wave_incr(event.control.value),
+        )
+
+    @on(Button.Pressed, "#plan_button")
+    def plan_pressed(self, event: Button.Pressed) -> None:
+        self.controller.submit("plan sweep", JobClass.MAINTENANCE, self.controller.plan_sweep())
 
     # -----------
     # Capture Tab
@@ -341,6 +478,7 @@ class MyTextualApp(App[str]):
 
     @on(Button.Pressed, "#reset_button")
     def reset_pressed(self, event: Button.Pressed) -> None:
+        self.controller.clear_plan()
         self.run_worker(self.controller.get_start_wavelength(), name="reset_wk", exclusive=True)
 
     # ----------
@@ -355,7 +493,28 @@ class MyTextualApp(App[str]):
 
     @on(Button.Pressed, "#export_button")
     def export_pressed(self, event: Button.Pressed) -> None:
-        self.run_worker(self.controller.export_samples(), exclusive=True)
+        if self.controller.paired:
+            self.controller.submit(
+                "paired export", JobClass.EXPORT, self.controller.export_paired_samples()
+            )
+        else:
+            self.controller.submit("export", JobClass.EXPORT, self.controller.export_samples())
+
+    @on(Button.Pressed, "#archive_button")
+    def archive_pressed(self, event: Button.Pressed) -> None:
+        self.controller.submit("archive", JobClass.MAINTENANCE, self.controller.archive_session())
+
+    @on(RadioSet.Changed, "#export_mode")
+    def export_mode_changed(self, event: RadioSet.Changed) -> None:
+        self.controller.export_mode = event.pressed.id.split("_")[0]
+
+    @on(Checkbox.Changed, "#paired_export")
+    def paired_changed(self, event: Checkbox.Changed) -> None:
+        self.controller.paired = event.control.value
+
+    @on(Input.Submitted, "#tolerance")
+    def tolerance(self, event: Input.Submitted) -> None:
+        self.controller.tolerance = event.control.value
 
     @on(Input.Submitted, "#directory")
     def directory(self, event: Input.Submitted) -> None:
@@ -370,6 +529,54 @@ class MyTextualApp(App[str]):
         option = event.control.get_option_at_index(event.option_index)
         self.run_worker(self.controller.set_selected_session(option.prompt), exclusive=True)
 
+    # ----------------
+    # Batch Export Tab
+    # ----------------
+
+    @on(Tabs.TabActivated, "#batch_tab")
+    async def batch_activated(self, event: Tabs.TabActivated) -> None:
+        self.update_batch_sessions(await self.controller.get_sessions())
+
+    @on(Button.Pressed, "#batch_all_button")
+    def batch_all_pressed(self, event: Button.Pressed) -> None:
+        self.batch_list_w.select_all()
+
+    @on(Button.Pressed, "#batch_export_button")
+    def batch_export_pressed(self, event: Button.Pressed) -> None:
+        selected = self.batch_list_w.selected
+        if selected:
+            self.controller.submit(
+                f"batch export ({len(selected)} sessions)",
+                JobClass.EXPORT,
+                self.controller.batch_export(selected),
+            )
+
+    # --------
+    # Jobs Tab
+    # --------
+
+    @on(Button.Pressed, "#cancel_job_button")
+    def cancel_job_pressed(self, event: Button.Pressed) -> None:
+        row = self.jobs_table_w.cursor_row
+        if 0 <= row < len(self._job_ids):
+            self.controller.jobs.cancel(self._job_ids[row])
+
+    # ------------
+    # Response Tab
+    # ------------
+
+    @on(Button.Pressed, "#compute_button")
+    def compute_pressed(self, event: Button.Pressed) -> None:
+        self.controller.submit(
+            "spectral response", JobClass.EXPORT, self.controller.compute_response()
+        )
+
+    @on(Button.Pressed, "#export_response_button")
+    def export_response_pressed(self, event: Button.Pressed) -> None:
+        self.controller.submit(
+            "export spectral response", JobClass.EXPORT, self.controller.export_response()
+        )
+
     @on(RadioSet.Changed, "#roles")
     def radio_set_changed(self, event: RadioSet.Changed) -> None:
         if str(event.pressed.label).startswith("Test"):
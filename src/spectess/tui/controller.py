@@ -10,16 +10,19 @@
 
 import os
 import csv
+import time
 import logging
 import asyncio
 
 from pathlib import PurePath
+from datetime import timedelta
+from collections import namedtuple
 
 # -------------------
 # Third party imports
 # -------------------
 
-from sqlalchemy import select, text
+from sqlalchemy import select, text, union, desc
 
 from lica.misc import measurements_session_id
 from lica.asyncio.photometer import Role, Model
@@ -30,16 +33,39 @@ from lica.asyncio.photometer.builder import PhotometerBuilder
 # -------------
 
 from ..ring import RingBuffer
-from ..dbase.model import Sample, Photometer as DbPhotometer
+from ..wavelength import WaveLimit
+from ..trace import Tracer
+from ..analysis import SpectralAnalyzer, rows, export_response, archive_response
+from ..join import asof_join
+from ..acquisition import AcquisitionProcess
+from ..store import archive_session, archived, SessionArchive
+from ..replay import dump_reading
+from ..jobs import JobManager, JobClass, progress
+from ..planner import CostModel, plan
+from ..monochromator import DEF_SETTLE
+from ..export import HEADERS, executor, export_session, session_filename
+from ..export import row_prefix, merge_steps, bin_row, bins_filename, write_bins
+from ..dbase.model import Sample, Step, Bin, Watermark, Photometer as DbPhotometer
+from ..dbase.model import create_missing
+from ..dbase.blob import pack_step, expand_step
+from ..dbase.bulk import insert_samples, format_tstamp
 
 # ----------------
 # Module constants
 # ----------------
 
+# Rows written between export progress reports
+PROGRESS_CHUNK = 5000
+
 # -----------------------
 # Module global variables
 # -----------------------
 
+# Paired export row, with the attribute names used by asof_join()
+PairedSample = namedtuple(
+    "PairedSample", ["wave", "filter", "name", "mac", "seq", "tstamp", "freq", "temp_box"]
+)
+
 # get the logger
 
 log = logging.getLogger(__name__)
@@ -48,21 +74,51 @@ log = logging.getLogger(__name__)
 # Auxiliary functions
 # -------------------
 
+
+async def aenumerate(aiterable, start=0):
+    i = start
+    async for item in aiterable:
+        yield i, item
+        i += 1
+
+
+async def aiter_list(items):
+    for item in items:
+        yield item
+
+
 # -------
 # Classes
 # -------
 
 
 class Controller:
-    def __init__(self, engine, session_class):
+    def __init__(
+        self,
+        engine,
+        session_class,
+        trace=None,
+        on_conflict="ignore",
+        acquisition=False,
+        storage="rows",
+        photometer=None,
+        record=None,
+        broadcaster=None,
+        monochromator=None,
+        bin_size=None,
+        bin_duration=None,
+        debug_window=0,
+    ):
         self.photometer = None
         self.producer = None
         self.consumer = None
         self.ring = None
         self.quit_event = None
-        builder = PhotometerBuilder()
-        # Although we use TEST / REF roles, we always build TEST like Photometer objects
-        self.photometer = builder.build(Model.TESSW, Role.TEST)
+        if photometer is None:
+            builder = PhotometerBuilder()
+            # Although we use TEST / REF roles, we always build TEST like Photometer objects
+            photometer = builder.build(Model.TESSW, Role.TEST)
+        self.photometer = photometer
         self.engine = engine
         self.session_class = session_class
         self._role = Role.TEST
@@ -74,6 +130,26 @@ class Controller:
         self._filename = PurePath(f"spectrum_calib_{self._meas_session}.csv")
         self._directory = PurePath(os.getcwd())
         self._selected_session = None
+        self.tracer = Tracer(trace)
+        self._on_conflict = on_conflict
+        self._cur_mac = None
+        self._cur_phot_id = None
+        self.analyzer = SpectralAnalyzer(session_class)
+        self._response = None
+        self._paired = False
+        self._export_mode = "full"
+        self._tolerance = timedelta(seconds=1)
+        self._storage = storage
+        self._record = record
+        self.acquisition = AcquisitionProcess() if acquisition else None
+        self.jobs = JobManager()
+        self.broadcaster = broadcaster
+        self.monochromator = monochromator
+        self._plan = None
+        self._plan_index = 0
+        self._bin_size = bin_size
+        self._bin_duration = bin_duration
+        self._debug_window = debug_window
 
     # ========================================
     # Public API to be used by the Textual TUI
@@ -82,9 +158,35 @@ class Controller:
     def set_view(self, view):
         self.view = view
 
+    def submit(self, name, job_class, coro):
+        return self.jobs.submit(name, job_class, coro)
+
     def quit(self):
         self.view.exit(return_code=2)
 
+    async def start_services(self):
+        await create_missing(self.engine)
+        if self.broadcaster is not None:
+            try:
+                await self.broadcaster.start()
+            except OSError as e:
+                # Not worth aborting a calibration run for
+                log.error("Broadcaster not started: %s", e)
+                self.broadcaster = None
+        if self.monochromator is not None:
+            await self.monochromator.open()
+        if self.acquisition is not None:
+            # Runs for the whole session, so steps start without spawning a process
+            await asyncio.to_thread(self.acquisition.start)
+
+    async def stop_services(self):
+        if self.acquisition is not None:
+            await asyncio.to_thread(self.acquisition.stop)
+        if self.broadcaster is not None:
+            await self.broadcaster.stop()
+        if self.monochromator is not None:
+            await self.monochromator.close()
+
     @property
     def session_id(self):
         return self._meas_session
@@ -99,6 +201,8 @@ class Controller:
         self._wavelength = int(value)
         log.info("setting current wavelength to %d", self._wavelength)
         self.view.set_wavelength(value)
+        if self.monochromator is not None:
+            self.monochromator.move(self._wavelength)
 
     @property
     def role(self) -> Role:
@@ -124,6 +228,30 @@ class Controller:
     def filename(self, value):
         self._filename = PurePath(value)
 
+    @property
+    def export_mode(self):
+        return self._export_mode
+
+    @export_mode.setter
+    def export_mode(self, value):
+        self._export_mode = value
+
+    @property
+    def paired(self):
+        return self._paired
+
+    @paired.setter
+    def paired(self, value):
+        self._paired = bool(value)
+
+    @property
+    def tolerance(self):
+        return str(self._tolerance.total_seconds())
+
+    @tolerance.setter
+    def tolerance(self, value):
+        self._tolerance = timedelta(seconds=float(value))
+
     @property
     def directory(self):
         return str(self._directory)
@@ -140,6 +268,9 @@ class Controller:
     async def set_selected_session(self, value):
         log.info("Setting selected session at %s", value)
         self._selected_session = int(value)
+        # The response shown and exported always belongs to the selected session
+        self._response = None
+        self.view.update_response_table(())
         self._filename = PurePath(f"spectrum_calib_{value}.csv")
         self.view.set_filename(str(self._filename))
         self.view.clear_roles_in_session()
@@ -149,7 +280,9 @@ class Controller:
     async def get_sessions(self):
         async with self.session_class() as session:
             async with session.begin():
-                q = select(Sample.session).distinct().order_by(Sample.session.desc())
+                q = union(
+                    select(Sample.session), select(Step.session), select(Bin.session)
+                ).order_by(desc("session"))
                 session_ids = (await session.scalars(q)).all()
                 result = tuple(str(item) for item in session_ids)
         return result
@@ -157,7 +290,11 @@ class Controller:
     async def get_roles_per_session(self, session_id):
         async with self.session_class() as session:
             async with session.begin():
-                q = select(Sample.role).distinct().where(Sample.session == session_id)
+                q = union(
+                    select(Sample.role).where(Sample.session == session_id),
+                    select(Step.role).where(Step.session == session_id),
+                    select(Bin.role).where(Bin.session == session_id),
+                )
                 roles = (await session.scalars(q)).all()
                 result = tuple(str(item) for item in roles)
         return result
@@ -226,6 +363,7 @@ class Controller:
                             )
                         )
             self._cur_mac = info.get("mac")
+            self._cur_phot_id = None
             self.view.enable_capture()
 
     async def receive(self):
@@ -234,112 +372,561 @@ class Controller:
         filt = self.view.get_filter()
         log = logging.getLogger(role)
         self.view.reset_progress()
+        self.view.reset_plot()
         log.info("Start receiving task on filter %s", filt)
-        while len(self.ring) < self._nsamples:
-            msg = await self.photometer.queue.get()
-            self.ring.append(msg)
-            line = f"{msg['tstamp'].strftime('%Y-%m-%d %H:%M:%S')} [{role}] [{filt}] [{msg.get('seq')}] [{self._wavelength} nm] f={msg['freq']} Hz, tbox={msg['tamb']}, tsky={msg['tsky']}"
-            self.view.append_log(line)
-            self.view.update_progress(1)
-        self.producer.cancel()
+        if self.monochromator is not None:
+            await self.monochromator.goto(self._wavelength)
+            self.tracer.mark("settled")
+        self._start_producer()
+        messages = self._messages()
+        recorded = list() if self._record else None
+        try:
+            while len(self.ring) < self._nsamples:
+                msg = await anext(messages)
+                self.tracer.reading()
+                self.ring.append(msg)
+                if recorded is not None:
+                    recorded.append(dump_reading(msg))
+                t0 = time.perf_counter()
+                line = f"{msg['tstamp'].strftime('%Y-%m-%d %H:%M:%S')} [{role}] [{filt}] [{msg.get('seq')}] [{self._wavelength} nm] f={msg['freq']} Hz, tbox={msg['tamb']}, tsky={msg['tsky']}"
+                self.view.append_log(line)
+                self.view.update_progress(1)
+                self.view.plot_reading(msg["freq"])
+                progress(len(self.ring), self._nsamples)
+                if self.broadcaster:
+                    self.broadcaster.publish(
+                        "reading",
+                        {
+                            "session": self._meas_session,
+                            "role": role,
+                            "filter": str(filt),
+                            "wavelength": self._wavelength,
+                            "seq": msg.get("seq"),
+                            "tstamp": msg["tstamp"].isoformat(),
+                            "freq": msg["freq"],
+                            "tamb": msg["tamb"],
+                            "tsky": msg["tsky"],
+                        },
+                    )
+                self.tracer.ui(time.perf_counter() - t0)
+            # Start moving to the next wavelength as soon as the last reading arrives,
+            # overlapping the move with the producer cleanup, statistics and saving
+            next_wave = self._next_wavelength()
+            if self.monochromator is not None and self._save and next_wave is not None:
+                self.monochromator.move(next_wave)
+        finally:
+            # Also on cancellation: stop the producer and keep what was recorded
+            await messages.aclose()
+            await self._stop_producer()
+            if recorded:
+                await asyncio.to_thread(self._write_record, recorded)
         median, mean, stdev = self.ring.statistics()
+        self.tracer.mark("stats")
+        self.view.plot_median(role, self._wavelength, median)
+        if self.broadcaster:
+            self.broadcaster.publish(
+                "step",
+                {
+                    "session": self._meas_session,
+                    "role": role,
+                    "filter": str(filt),
+                    "wavelength": self._wavelength,
+                    "nsamples": len(self.ring),
+                    "median": median,
+                    "mean": mean,
+                    "stdev": stdev,
+                },
+            )
         line = f"[{role}] [{filt}] median = {median:0.3f} Hz, \u03bc = {mean:0.3f} Hz, \u03c3 = {stdev:0.3f} Hz @ \u03bb = {self._wavelength} nm"
         self.view.append_log(line)
         if not self._save:
             self.view.append_log("WARNING: not saving samples")
         else:
             await self.save_samples()
+            self._advance()
+            self.tracer.mark("advance")
+        self.tracer.end()
+
+    async def plan_sweep(self):
+        """Orders the REF and TEST steps from the starting wavelength up to the maximum"""
+        start = int(await self.get_start_wavelength())
+        if self._wave_incr <= 0:
+            self.view.show_plan("Wavelength increment must be positive")
+            return
+        settle = self.monochromator.settle if self.monochromator is not None else DEF_SETTLE
+        cost = CostModel(self._nsamples, settle=settle)
+        waves = range(start, WaveLimit.MAX + 1, self._wave_incr)
+        if not waves:
+            line = f"No wavelengths to plan from {start} nm up to {WaveLimit.MAX} nm"
+            log.warning(line)
+            self.view.show_plan(line)
+            return
+        best, naive = plan(waves, (Role.REF, Role.TEST), cost)
+        line = f"Plan: {best.summary()}. Naive sweep: {naive.summary()}"
+        log.info(line)
+        self.view.show_plan(line)
+        self.view.append_log(line)
+        self._plan = best
+        self._plan_index = 0
+        self._apply_step(best[0])
+
+    def clear_plan(self):
+        self._plan = None
+        self.view.show_plan("")
+
+    def _apply_step(self, step):
+        if step.role is not self._role:
+            self.view.append_log(f"Place the {step.role.tag()} photometer and detect it")
+            # Capture waits for get_info() to detect the new unit, so that
+            # samples are never saved under the previous photometer
+            self._cur_mac = None
+            self._cur_phot_id = None
+            self.view.reset_switch()
+            self.view.disable_capture()
+        if step.filter is not self.view.get_filter():
+            self.view.append_log(f"Place the {step.filter} filter")
+        self._role = step.role
+        self.view.set_role(step.role)
+        self.wavelength = step.wavelength
+
+    def _next_wavelength(self):
+        if self._plan is None:
+            wavelength = self._wavelength + self._wave_incr
+            return wavelength if wavelength <= WaveLimit.MAX else None
+        i = self._plan_index + 1
+        return self._plan[i].wavelength if i < len(self._plan) else None
+
+    def _advance(self):
+        if self._plan is None:
             self._wavelength += self._wave_incr
             log.info("Increasing wavelength to %d", self._wavelength)
             self.view.set_wavelength(self._wavelength)
+            return
+        self._plan_index += 1
+        if self._plan_index < len(self._plan):
+            self._apply_step(self._plan[self._plan_index])
+        else:
+            self.view.append_log("Sweep plan completed")
+            self.clear_plan()
 
     def start_readings(self):
-        self.photometer.clear()
-        self.ring = RingBuffer(capacity=self._nsamples)
-        self.consumer = asyncio.create_task(self.receive())
-        self.producer = asyncio.create_task(self.photometer.readings())
+        if self.jobs.busy(JobClass.CAPTURE):
+            log.warning("A capture is already in progress")
+            return
+        self.tracer.begin(
+            self._meas_session,
+            self._role.tag(),
+            self._wavelength,
+            str(self.view.get_filter()),
+            self._nsamples,
+        )
+        self.ring = RingBuffer(
+            capacity=self._nsamples,
+            bin_size=self._bin_size,
+            bin_duration=self._bin_duration,
+            debug_window=self._debug_window,
+        )
+        self.consumer = self.submit(
+            f"capture {self._role.tag()} @ {self._wavelength} nm", JobClass.CAPTURE, self.receive()
+        ).task
 
     async def save_samples(self):
-        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+        self.tracer.mark("save_begin")
+        if self.ring.binning:
+            await self._save_bins()
+        elif self._storage == "steps":
+            await self._save_step()
+        else:
+            await self._save_rows()
+        self.tracer.mark("save_commit")
+
+    async def _save_rows(self):
         role = self._role.tag()
         filt = self.view.get_filter()
         async with self.session_class() as session:
             async with session.begin():
-                q = select(DbPhotometer).where(DbPhotometer.mac == self._cur_mac)
-                dbphot = (await session.scalars(q)).one()
-                samples = await dbphot.awaitable_attrs.samples  # Asunchronous relationship reload
+                if self._cur_phot_id is None:
+                    q = select(DbPhotometer.id).where(DbPhotometer.mac == self._cur_mac)
+                    self._cur_phot_id = (await session.scalars(q)).one()
+                rows = list()
                 while len(self.ring) > 0:
                     s = self.ring.pop()
-                    samples.append(
-                        Sample(
-                            tstamp=s["tstamp"],
-                            role=role,
-                            session=self._meas_session,
-                            seq=s["seq"],
-                            mag=s["mag"],
-                            freq=s["freq"],
-                            temp_box=s["tamb"],
-                            wave=self._wavelength,
-                            filter=str(filt),
+                    rows.append(
+                        (
+                            self._cur_phot_id,
+                            format_tstamp(s["tstamp"]),
+                            role,
+                            self._meas_session,
+                            s["seq"],
+                            s["mag"],
+                            s["freq"],
+                            s["tamb"],
+                            self._wavelength,
+                            str(filt),
                         )
                     )
-                session.add(dbphot)
-        logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+                conn = await session.connection()
+                saved, skipped = await insert_samples(conn, rows, conflict=self._on_conflict)
+        if skipped:
+            line = f"WARNING: {skipped} duplicate samples skipped, {saved} saved"
+            log.warning(line)
+            self.view.append_log(line)
+
+    async def _save_step(self):
+        """Saves the whole step as a single row with packed per sample arrays"""
+        readings = list()
+        while len(self.ring) > 0:
+            readings.append(self.ring.pop())
+        if not readings:
+            return
+        async with self.session_class() as session:
+            async with session.begin():
+                if self._cur_phot_id is None:
+                    q = select(DbPhotometer.id).where(DbPhotometer.mac == self._cur_mac)
+                    self._cur_phot_id = (await session.scalars(q)).one()
+                session.add(
+                    Step(
+                        phot_id=self._cur_phot_id,
+                        role=self._role.tag(),
+                        session=self._meas_session,
+                        wave=self._wavelength,
+                        filter=str(self.view.get_filter()),
+                        **pack_step(readings),
+                    )
+                )
+
+    async def _save_bins(self):
+        """Saves the bin aggregates of the step, plus the raw readings in the debug window"""
+        role = self._role.tag()
+        filt = str(self.view.get_filter())
+        bins = self.ring.pop_bins()
+        debug = self.ring.pop_debug()
+        async with self.session_class() as session:
+            async with session.begin():
+                if self._cur_phot_id is None:
+                    q = select(DbPhotometer.id).where(DbPhotometer.mac == self._cur_mac)
+                    self._cur_phot_id = (await session.scalars(q)).one()
+                session.add_all(
+                    Bin(
+                        phot_id=self._cur_phot_id,
+                        role=role,
+                        session=self._meas_session,
+                        wave=self._wavelength,
+                        filter=filt,
+                        **aggregates,
+                    )
+                    for aggregates in bins
+                )
+                if debug:
+                    rows = [
+                        (
+                            self._cur_phot_id,
+                            format_tstamp(s["tstamp"]),
+                            role,
+                            self._meas_session,
+                            s["seq"],
+                            s["mag"],
+                            s["freq"],
+                            s["tamb"],
+                            self._wavelength,
+                            filt,
+                        )
+                        for s in debug
+                    ]
+                    conn = await session.connection()
+                    await insert_samples(conn, rows, conflict=self._on_conflict)
+        log.info("Saved %d bins and %d raw debug readings", len(bins), len(debug))
 
     async def export_samples(self):
-        HEADERS = (
-            "name",
-            "mac",
-            "model",
-            "sensor",
-            "freq_offset",
-            "session",
-            "role",
-            "wavelength",
-            "filter",
-            "seq_number",
-            "timestamp",
-            "frequency",
-            "box_temperature",
-        )
+        filename = str(self._directory / self._filename)
+        base = PurePath(filename)
+        # Delta files have their own watermark, as their rows never reach the main file
+        key = filename
+        if self._export_mode == "delta":
+            key = str(base.with_name(f"{base.stem}_delta{base.suffix}"))
         async with self.session_class() as session:
             async with session.begin():
+                watermark = await session.get(Watermark, (self._selected_session, key))
+                if watermark is None and key != filename:
+                    # The first delta starts where the main file ended
+                    watermark = await session.get(Watermark, (self._selected_session, filename))
+                incremental = watermark is not None and (
+                    self._export_mode == "delta"
+                    or (self._export_mode == "append" and os.path.exists(filename))
+                )
+                if not incremental:
+                    # A full export rewrites the main file
+                    key = filename
+                after_sample = watermark.last_sample_id if incremental else 0
+                after_step = watermark.last_step_id if incremental else 0
                 q = (
                     select(Sample)
                     .join(Sample.photometer)
-                    .where(Sample.session == self._selected_session)
+                    .where(Sample.session == self._selected_session, Sample.id > after_sample)
                     .order_by(Sample.wave, Sample.seq)
                 )
                 samples = (await session.scalars(q)).all()
-                filename = str(self._directory / self._filename)
-            with open(filename, "w", newline="") as csvfile:
-                writer = csv.writer(csvfile, delimiter=";")
-                writer.writerow(HEADERS)
+                q = (
+                    select(Step)
+                    .join(Step.photometer)
+                    .where(Step.session == self._selected_session, Step.id > after_step)
+                    .order_by(Step.wave)
+                )
+                steps = (await session.scalars(q)).all()
+                last_sample = max((sample.id for sample in samples), default=after_sample)
+                last_step = max((step.id for step in steps), default=after_step)
+                rows = list()
                 for sample in samples:
                     phot = (
                         await sample.awaitable_attrs.photometer
                     )  # Asunchronous relationship reload
-                    row = [
-                        phot.name,
-                        phot.mac,
-                        phot.model,
-                        phot.sensor,
-                        phot.freq_offset,
-                        sample.session,
-                        sample.role,
-                        sample.wave,
-                        sample.filter,
-                        sample.seq,
-                        sample.tstamp,
-                        sample.freq,
-                        sample.temp_box,
-                    ]
+                    rows.append(
+                        row_prefix(phot, sample)
+                        + [sample.seq, sample.tstamp, sample.freq, sample.temp_box]
+                    )
+                prefixes = [
+                    row_prefix(await step.awaitable_attrs.photometer, step) for step in steps
+                ]
+                rows = merge_steps(rows, list(zip(prefixes, steps)))
+                # Bins are few, so they are always exported in full
+                q = (
+                    select(Bin)
+                    .where(Bin.session == self._selected_session)
+                    .order_by(Bin.wave, Bin.seq_first)
+                )
+                bins = [
+                    bin_row(await b.awaitable_attrs.photometer, b)
+                    for b in (await session.scalars(q)).all()
+                ]
+            if bins:
+                log.info("Exporting %d bins to %s", len(bins), bins_filename(filename))
+                write_bins(filename, bins)
+            if incremental and not rows:
+                line = f"No new samples to export since {filename} was last written"
+                log.info(line)
+                self.view.append_log(line)
+                return
+            if incremental and self._export_mode == "append":
+                path, mode, header = filename, "a", False
+            elif incremental:
+                delta = f"{base.stem}_delta_{after_sample + 1}_{last_sample}{base.suffix}"
+                path = str(base.with_name(delta))
+                mode, header = "w", True
+            else:
+                path, mode, header = filename, "w", True
+            log.info("Exporting %d samples to %s", len(rows), path)
+            with open(path, mode, newline="") as csvfile:
+                writer = csv.writer(csvfile, delimiter=";")
+                if header:
+                    writer.writerow(HEADERS)
+                for i in range(0, len(rows), PROGRESS_CHUNK):
+                    writer.writerows(rows[i : i + PROGRESS_CHUNK])
+                    progress(min(i + PROGRESS_CHUNK, len(rows)), len(rows))
+                    await asyncio.sleep(0)
+            # The watermark only advances once the file has been written
+            async with session.begin():
+                await session.merge(
+                    Watermark(
+                        session=self._selected_session,
+                        filename=key,
+                        last_sample_id=last_sample,
+                        last_step_id=last_step,
+                    )
+                )
+
+    async def batch_export(self, session_ids):
+        """Exports each session to its own file in the export directory, fanned out
+        to a pool of processes with their own read only database connections"""
+        t0 = time.perf_counter()
+        db_path = self.engine.url.database
+        loop = asyncio.get_running_loop()
+        pool = executor()
+        try:
+            futures = [
+                loop.run_in_executor(
+                    pool,
+                    export_session,
+                    db_path,
+                    session_id,
+                    str(self._directory / session_filename(session_id)),
+                )
+                for session_id in session_ids
+            ]
+            total = 0
+            progress(0, len(futures))
+            for i, future in enumerate(asyncio.as_completed(futures), start=1):
+                total += await future
+                progress(i)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        line = f"Exported {len(session_ids)} sessions ({total} rows) to {self._directory} in {time.perf_counter() - t0:0.1f} s"
+        log.info(line)
+        self.view.append_log(line)
+
+    async def export_paired_samples(self):
+        """Exports TEST samples paired with the as-of REF sample in the same wavelength"""
+        if await self._binned(self._selected_session):
+            self._refuse("cannot be paired sample by sample")
+            return
+        HEADERS = (
+            "wavelength",
+            "filter",
+            "test_name",
+            "test_mac",
+            "test_seq_number",
+            "test_timestamp",
+            "test_frequency",
+            "test_box_temperature",
+            "ref_name",
+            "ref_mac",
+            "ref_seq_number",
+            "ref_timestamp",
+            "ref_frequency",
+            "ref_box_temperature",
+            "delta_t",
+        )
+
+        def query(role):
+            return (
+                select(
+                    Sample.wave,
+                    Sample.filter,
+                    DbPhotometer.name,
+                    DbPhotometer.mac,
+                    Sample.seq,
+                    Sample.tstamp,
+                    Sample.freq,
+                    Sample.temp_box,
+                )
+                .join(Sample.photometer)
+                .where(Sample.session == self._selected_session, Sample.role == role.tag())
+                .order_by(Sample.wave, Sample.tstamp)
+            )
+
+        async def role_rows(session, role):
+            """Samples stream straight from samples_t. Step stored ones are expanded
+            and merged in memory, as the join needs them in (wave, tstamp) order"""
+            q = (
+                select(Step.wave, Step.filter, DbPhotometer.name, DbPhotometer.mac, Step)
+                .join(Step.photometer)
+                .where(Step.session == self._selected_session, Step.role == role.tag())
+            )
+            steps = (await session.execute(q)).all()
+            if not steps:
+                return await session.stream(query(role))
+            rows = [PairedSample(*row) for row in (await session.execute(query(role))).all()]
+            for wave, filt, name, mac, step in steps:
+                for tstamp, seq, mag, freq, temp_box in expand_step(step):
+                    rows.append(PairedSample(wave, filt, name, mac, seq, tstamp, freq, temp_box))
+            rows.sort(key=lambda row: (row.wave, row.tstamp))
+            return aiter_list(rows)
+
+        filename = str(self._directory / self._filename)
+        log.info(
+            "Exporting paired REF/TEST samples to %s with tolerance %s",
+            filename,
+            self._tolerance,
+        )
+        async with self.session_class() as test_session, self.session_class() as ref_session:
+            test_rows = await role_rows(test_session, Role.TEST)
+            ref_rows = await role_rows(ref_session, Role.REF)
+            with open(filename, "w", newline="") as csvfile:
+                writer = csv.writer(csvfile, delimiter=";")
+                writer.writerow(HEADERS)
+                async for i, (test, ref) in aenumerate(
+                    asof_join(test_rows, ref_rows, self._tolerance)
+                ):
+                    if i % PROGRESS_CHUNK == 0:
+                        progress(i)
+                    row = [test.wave, test.filter, *tuple(test)[2:]]
+                    if ref is None:
+                        row.extend([None] * 7)
+                    else:
+                        row.extend(tuple(ref)[2:])
+                        row.append((test.tstamp - ref.tstamp).total_seconds())
                     writer.writerow(row)
 
+    async def archive_session(self):
+        """Writes the selected session as a memory mapped NumPy archive in the export directory"""
+        if self._selected_session is None:
+            log.warning("No session selected for archiving")
+            return
+        if await self._binned(self._selected_session):
+            self._refuse("cannot be stored in a NumPy archive of samples")
+            return
+        # Taken first, so that samples added while archiving make the archive stale
+        watermark = await self.analyzer.watermark(self._selected_session)
+        await archive_session(
+            self.session_class, self._selected_session, self._directory, watermark
+        )
+
+    async def compute_response(self):
+        if self._selected_session is None:
+            log.warning("No session selected for spectral response")
+            return
+        archive = None
+        if archived(self._directory, self._selected_session):
+            archive = SessionArchive(self._directory, self._selected_session)
+            if archive.watermark != await self.analyzer.watermark(self._selected_session):
+                log.info("Archive of session %s is out of date", self._selected_session)
+                archive = None
+        if archive is not None:
+            log.info("Spectral response of session %s from its archive", self._selected_session)
+            self._response = await asyncio.to_thread(archive_response, archive)
+        else:
+            self._response = await self.analyzer.compute(self._selected_session)
+        self.view.update_response_table(rows(self._response))
+
+    async def export_response(self):
+        if self._response is None:
+            await self.compute_response()
+        if self._response is None:
+            return
+        filename = str(self._directory / f"spectral_response_{self._selected_session}.csv")
+        log.info("Exporting spectral response to %s", filename)
+        export_response(self._response, filename)
+
     # ======================
     # Private helper methods
     # ======================
 
+    async def _messages(self):
+        """Readings from the local producer queue or from the acquisition process ring"""
+        if self.acquisition is None:
+            while True:
+                yield await self.photometer.queue.get()
+        async for batch in self.acquisition.batches():
+            for msg in batch:
+                yield msg
+
+    def _start_producer(self):
+        if self.acquisition is None:
+            self.photometer.clear()
+            self.producer = asyncio.create_task(self.photometer.readings())
+        else:
+            # Readings taken between steps belong to no wavelength
+            self.acquisition.ring.skip()
+
+    def _write_record(self, lines):
+        """Appends the readings of a whole step to the raw stream file"""
+        with open(self._record, "a") as fd:
+            fd.writelines(lines)
+
+    async def _stop_producer(self):
+        """The acquisition process keeps running between steps"""
+        if self.acquisition is None and self.producer is not None:
+            self.producer.cancel()
+
+    async def _binned(self, session_id):
+        async with self.session_class() as session:
+            q = select(Bin.id).where(Bin.session == session_id).limit(1)
+            return (await session.scalars(q)).first() is not None
+
+    def _refuse(self, reason):
+        line = f"Session {self._selected_session} was saved as bins and {reason}"
+        log.warning(line)
+        self.view.append_log(line)
+
     async def _get_property(self, section, property):
         async with self.engine.begin() as conn:
             result = await conn.execute(
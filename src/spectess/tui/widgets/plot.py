@@ -0,0 +1,117 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# -------------------------
+# Python standrad libraries
+# -------------------------
+
+# ---------------
+# Textual imports
+# ---------------
+
+from textual.app import ComposeResult
+from textual.widget import Widget
+from textual.widgets import Label, Sparkline
+
+from lica.asyncio.photometer import Role
+
+# --------------
+# local imports
+# -------------
+
+from ...downsample import lttb, MinMaxDecimator
+
+# ----------------
+# Module constants
+# ----------------
+
+# Maximum redraws per second, whatever the readings rate
+REFRESH_RATE = 4
+# Decimated points kept for the current step series
+STEP_POINTS = 128
+# One session series per photometer role
+ROLES = (Role.REF, Role.TEST)
+
+
+class FrequencyPlot(Widget):
+    """Frequency vs time for the current step and median vs wavelength
+    for the session, one series per photometer role.
+    Readings only mark the plot as dirty; redraws happen in a rate limited timer."""
+
+    DEFAULT_CSS = """
+    FrequencyPlot {
+        layout: vertical;
+        height: auto;
+        border: solid yellow;
+    }
+
+    FrequencyPlot Sparkline {
+        height: 3;
+    }
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._step = MinMaxDecimator(STEP_POINTS)
+        self._last = None
+        self._medians = dict()
+        self._dirty = False
+
+    def compose(self) -> ComposeResult:
+        yield Label("Step: -", id="step_label")
+        yield Sparkline([], id="step_plot")
+        for role in ROLES:
+            yield Label(f"Session {role.name}: -", id=f"session_label_{role.name.lower()}")
+            yield Sparkline([], id=f"session_plot_{role.name.lower()}")
+
+    def _on_mount(self) -> None:
+        self.border_title = "Frequency (Hz)"
+        self.set_interval(1 / REFRESH_RATE, self._redraw)
+
+    def reset_step(self) -> None:
+        self._step.clear()
+        self._last = None
+        self._dirty = True
+
+    def add_reading(self, freq: float) -> None:
+        self._step.append(freq)
+        self._last = freq
+        self._dirty = True
+
+    def add_median(self, role: Role | str, wavelength: int, median: float) -> None:
+        """role is a Role or its stored tag, as given by Role.tag()"""
+        key = role.tag() if isinstance(role, Role) else str(role)
+        self._medians.setdefault(key, dict())[int(wavelength)] = median
+        self._dirty = True
+
+    def clear_session(self) -> None:
+        self._medians.clear()
+        self._dirty = True
+
+    def _redraw(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        width = max(self.size.width, 3)
+        self.query_one("#step_plot", Sparkline).data = self._step.values()
+        if self._last is not None:
+            self.query_one("#step_label", Label).update(
+                f"Step: {len(self._step)} readings, f = {self._last} Hz"
+            )
+        else:
+            self.query_one("#step_label", Label).update("Step: -")
+        for role in ROLES:
+            series = self._medians.get(role.tag(), dict())
+            name = role.name
+            waves = sorted(series)
+            _, medians = lttb(waves, [series[w] for w in waves], width)
+            self.query_one(f"#session_plot_{name.lower()}", Sparkline).data = medians
+            text = (
+                f"Session {name}: median vs λ [{waves[0]} - {waves[-1]} nm]"
+                if waves
+                else f"Session {name}: -"
+            )
+            self.query_one(f"#session_label_{name.lower()}", Label).update(text)
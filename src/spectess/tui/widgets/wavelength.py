@@ -7,7 +7,6 @@
 # -------------------------
 # Python standrad libraries
 # -------------------------
-from enum import Enum, IntEnum
 
 # ---------------
 # Textual imports
@@ -23,19 +22,11 @@ from textual.containers import Horizontal
 
 from lica.textual.widgets.label import WritableLabel
 
+# --------------
+# local imports
+# -------------
 
-class WaveLimit(IntEnum):
-    MIN = 350
-    MAX = 1050
-
-
-class Filter(Enum):
-    BG38 = "BG38"
-    OG570 = "OG570"
-    RG830 = "RG830"
-
-    def __str__(self):
-        return f"{self.value}"
+from ...wavelength import WaveLimit, Filter, compute_filter
 
 
 class Wavelength(Widget):
@@ -74,14 +65,7 @@ class Wavelength(Widget):
         self.query_one(Digits).update(str(new_wave))
 
     def _compute_filter(self) -> Filter:
-        w = int(self.wavelength)
-        if w < 570:
-            result = Filter.BG38
-        elif 570 <= w < 860:
-            result = Filter.OG570
-        else:
-            result = Filter.RG830
-        return result
+        return compute_filter(int(self.wavelength))
 
     def _on_mount(self) -> None:
         self.border_title = "Current Wavelength (nm)"
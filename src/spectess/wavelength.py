@@ -0,0 +1,45 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+# --------------------
+# System wide imports
+# -------------------
+
+from enum import Enum, IntEnum
+
+# -------
+# Classes
+# -------
+
+
+class WaveLimit(IntEnum):
+    MIN = 350
+    MAX = 1050
+
+
+class Filter(Enum):
+    BG38 = "BG38"
+    OG570 = "OG570"
+    RG830 = "RG830"
+
+    def __str__(self):
+        return f"{self.value}"
+
+
+# -------------------
+# Auxiliary functions
+# -------------------
+
+
+def compute_filter(wavelength: int) -> Filter:
+    """Filter in the light path for a given wavelength"""
+    if wavelength < 570:
+        result = Filter.BG38
+    elif 570 <= wavelength < 860:
+        result = Filter.OG570
+    else:
+        result = Filter.RG830
+    return result
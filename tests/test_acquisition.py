@@ -0,0 +1,72 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+
+from spectess.ring import RingBuffer
+from spectess.acquisition import AcquisitionProcess, SharedRing
+from spectess.tui.controller import Controller
+
+T0 = datetime(2024, 10, 18, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def reading(seq):
+    return dict(
+        tstamp=T0 + timedelta(seconds=seq), seq=seq, freq=100.0 + seq, mag=15.0, tamb=20.0, tsky=0.0
+    )
+
+
+class View:
+    def get_filter(self):
+        return "BG38"
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def test_shared_ring_skip_and_overrun():
+    ring = SharedRing(capacity=4)
+    try:
+        for seq in range(3):
+            ring.put(reading(seq))
+        ring.skip()
+        assert ring.get_batch() == []
+        for seq in range(3, 9):
+            ring.put(reading(seq))
+        assert [msg["seq"] for msg in ring.get_batch()] == [5, 6, 7, 8]
+        assert ring.lost == 2
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_step_skips_readings_taken_between_steps():
+    acquisition = AcquisitionProcess()
+    # Stands in for the ring fed by the acquisition process, started once per session
+    acquisition.ring = SharedRing(capacity=64)
+    controller = Controller(None, None, photometer=object())
+    controller.acquisition = acquisition
+    controller.set_view(View())
+    controller._nsamples = 3
+    controller.ring = RingBuffer(capacity=3)
+
+    async def run():
+        for seq in range(5):
+            acquisition.ring.put(reading(seq))
+        receiver = asyncio.create_task(controller.receive())
+        await asyncio.sleep(0.05)
+        for seq in range(5, 8):
+            acquisition.ring.put(reading(seq))
+        await receiver
+
+    try:
+        asyncio.run(run())
+        assert controller.ring.frequencies() == [105.0, 106.0, 107.0]
+    finally:
+        acquisition.ring.close()
+        acquisition.ring.unlink()
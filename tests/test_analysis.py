@@ -0,0 +1,74 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import statistics
+
+import numpy as np
+
+from spectess.analysis import (
+    bin_statistics,
+    group_statistics,
+    merge_statistics,
+    spectral_response,
+)
+
+
+def test_group_statistics_matches_statistics_module():
+    rng = np.random.default_rng(1)
+    wave = rng.choice([400, 450, 500], size=300)
+    freq = rng.normal(100.0, 5.0, size=300)
+    waves, count, median, mean, stdev = group_statistics(wave, freq)
+    assert waves.tolist() == [400, 450, 500]
+    for i, w in enumerate(waves):
+        values = freq[wave == w].tolist()
+        assert count[i] == len(values)
+        assert median[i] == statistics.median_low(values)
+        assert np.isclose(mean[i], statistics.fmean(values))
+        assert np.isclose(stdev[i], statistics.stdev(values))
+
+
+def test_spectral_response_common_wavelengths_normalized():
+    ref = (np.array([400, 400, 500, 500, 600]), np.array([10.0, 10.0, 20.0, 20.0, 5.0]))
+    test = (np.array([400, 400, 500, 500]), np.array([5.0, 5.0, 20.0, 20.0]))
+    response = spectral_response(ref, test)
+    assert response["wavelength"].tolist() == [400, 500]
+    assert response["ratio"].tolist() == [0.5, 1.0]
+    assert response["norm"].tolist() == [0.5, 1.0]
+
+
+def bins_of(wave, freq, size):
+    """Consecutive bins of up to size readings per wavelength, as stored in bins_t"""
+    columns = list()
+    for w in np.unique(wave):
+        values = freq[wave == w]
+        for i in range(0, values.size, size):
+            chunk = values[i : i + size]
+            stdev = statistics.stdev(chunk) if chunk.size > 1 else 0.0
+            columns.append((w, chunk.size, statistics.median_low(chunk), chunk.mean(), stdev))
+    return tuple(np.array(column) for column in zip(*columns))
+
+
+def test_bin_statistics_pool_exactly():
+    rng = np.random.default_rng(2)
+    wave = rng.choice([400, 450], size=205)
+    freq = rng.normal(100.0, 5.0, size=205)
+    expected = group_statistics(wave, freq)
+    waves, count, median, mean, stdev = bin_statistics(*bins_of(wave, freq, 10))
+    assert waves.tolist() == expected[0].tolist()
+    assert count.tolist() == expected[1].tolist()
+    assert np.allclose(mean, expected[3])
+    assert np.allclose(stdev, expected[4])
+    # Single reading bins give the exact median
+    assert np.array_equal(bin_statistics(*bins_of(wave, freq, 1))[2], expected[2])
+
+
+def test_merge_statistics_prefers_bins():
+    raw = group_statistics(np.array([400, 400, 500]), np.array([1.0, 3.0, 7.0]))
+    binned = bin_statistics(*(np.array([x]) for x in (400, 20, 2.0, 2.0, 0.5)))
+    waves, count, median, mean, stdev = merge_statistics(raw, binned)
+    assert waves.tolist() == [400, 500]
+    assert count.tolist() == [20, 1]
+    assert median.tolist() == [2.0, 7.0]
@@ -0,0 +1,84 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from spectess.dbase.model import Model, Photometer, Sample, Bin
+from spectess.archive import archive_path, attach_bins, read_session, write_columns
+
+T0 = datetime(2024, 10, 18, 12, 0, 0)
+
+
+def populate(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Model.metadata.create_all(engine)
+    with Session(engine) as session, session.begin():
+        phot = Photometer(
+            name="stars1",
+            mac="AA:BB:CC:DD:EE:FF",
+            sensor="TSL237",
+            model="TESS-W",
+            firmware="1.0",
+            zero_point=20.5,
+            freq_offset=0.0,
+        )
+        common = dict(photometer=phot, role="REF.", session=3, filter="BG38", wave=400)
+        session.add(
+            Sample(**common, tstamp=T0, seq=0, mag=15.0, freq=100.0, temp_box=20.0),
+        )
+        for i in range(2):
+            session.add(
+                Bin(
+                    **common,
+                    count=5,
+                    tstamp_first=T0 + timedelta(seconds=5 * i),
+                    tstamp_last=T0 + timedelta(seconds=5 * i + 4),
+                    seq_first=5 * i,
+                    seq_last=5 * i + 4,
+                    freq_mean=100.0 + i,
+                    freq_median=100.0 + i,
+                    freq_stdev=0.5,
+                    mag_mean=15.0,
+                    temp_box_mean=20.0,
+                )
+            )
+    engine.dispose()
+
+
+def test_bins_archive_round_trip(tmp_path):
+    db_path = tmp_path / "spectess.db"
+    populate(db_path)
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        async with engine.connect() as conn:
+            columns, bins, photometers = await read_session(conn, 3)
+        write_columns(archive_path(tmp_path, 3), 3, columns, bins, photometers)
+        with np.load(archive_path(tmp_path, 3)) as archive:
+            archived = {key: archive[key] for key in archive.files}
+        async with engine.begin() as conn:
+            phot_ids = dict((await conn.execute(select(Photometer.mac, Photometer.id))).all())
+            # Already present bins are not duplicated
+            assert await attach_bins(conn, 3, archived, phot_ids) == 0
+            await conn.execute(Bin.__table__.delete())
+            assert await attach_bins(conn, 3, archived, phot_ids) == 2
+            q = select(func.count(Bin.id), func.max(Bin.tstamp_last), func.sum(Bin.freq_mean))
+            count, last, total = (await conn.execute(q)).one()
+        await engine.dispose()
+        return len(columns["seq"]), photometers, count, last, total
+
+    nsamples, photometers, count, last, total = asyncio.run(run())
+    assert nsamples == 1
+    assert [phot["mac"] for phot in photometers] == ["AA:BB:CC:DD:EE:FF"]
+    assert (count, last, total) == (2, T0 + timedelta(seconds=9), 201.0)
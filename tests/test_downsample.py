@@ -0,0 +1,35 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import math
+
+from spectess.downsample import lttb, MinMaxDecimator
+
+
+def test_lttb_short_series_unchanged():
+    x, y = list(range(10)), [float(i) for i in range(10)]
+    assert lttb(x, y, 20) == (x, y)
+
+
+def test_lttb_keeps_ends_and_peak():
+    x = list(range(1000))
+    y = [math.sin(i / 50) for i in x]
+    y[500] = 10.0
+    sx, sy = lttb(x, y, 50)
+    assert len(sx) == len(sy) == 50
+    assert (sx[0], sx[-1]) == (0, 999)
+    assert sx == sorted(sx)
+    assert 10.0 in sy
+
+
+def test_minmax_decimator_bounded():
+    decimator = MinMaxDecimator(16)
+    for i in range(10_000):
+        decimator.append(float(i % 100))
+    values = decimator.values()
+    assert len(decimator) == 10_000
+    assert len(values) <= 2 * 16 + 2
+    assert min(values) == 0.0 and max(values) == 99.0
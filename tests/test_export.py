@@ -0,0 +1,184 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import csv
+import asyncio
+
+from pathlib import PurePath
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from spectess.dbase.model import Model, Photometer, Sample, Step, Bin
+from spectess.dbase.blob import pack_step
+from spectess.export import BIN_HEADERS, HEADERS, bins_filename, export_session, list_sessions
+from spectess.tui.controller import Controller
+
+T0 = datetime(2024, 10, 18, 12, 0, 0)
+
+
+def reading(seq):
+    return dict(tstamp=T0 + timedelta(seconds=seq), seq=seq, mag=15.0, freq=100.0 + seq, tamb=20.0)
+
+
+def populate(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Model.metadata.create_all(engine)
+    with Session(engine) as session, session.begin():
+        phot = Photometer(
+            name="stars1",
+            mac="AA:BB:CC:DD:EE:FF",
+            sensor="TSL237",
+            model="TESS-W",
+            firmware="1.0",
+            zero_point=20.5,
+            freq_offset=0.0,
+        )
+        session.add(phot)
+        common = dict(photometer=phot, role="TEST", session=1, filter="BG38")
+        for seq in (0, 1, 2):
+            r = reading(seq)
+            session.add(
+                Sample(
+                    **common,
+                    wave=500,
+                    tstamp=r["tstamp"],
+                    seq=seq,
+                    mag=r["mag"],
+                    freq=r["freq"],
+                    temp_box=r["tamb"],
+                )
+            )
+        session.add(Step(**common, wave=400, **pack_step([reading(seq) for seq in (3, 4)])))
+        session.add(Step(**common, wave=500, **pack_step([reading(seq) for seq in (5, 6)])))
+        # A binned session, with a raw debug reading
+        common["session"] = 2
+        session.add(
+            Bin(
+                **common,
+                wave=400,
+                count=10,
+                tstamp_first=T0,
+                tstamp_last=T0 + timedelta(seconds=9),
+                seq_first=0,
+                seq_last=9,
+                freq_mean=100.0,
+                freq_median=100.0,
+                freq_stdev=1.0,
+                mag_mean=15.0,
+                temp_box_mean=20.0,
+            )
+        )
+        r = reading(9)
+        session.add(
+            Sample(
+                **common,
+                wave=400,
+                tstamp=r["tstamp"],
+                seq=9,
+                mag=r["mag"],
+                freq=r["freq"],
+                temp_box=r["tamb"],
+            )
+        )
+    engine.dispose()
+
+
+def test_export_session_merges_storage_layouts(tmp_path):
+    db_path = tmp_path / "spectess.db"
+    populate(db_path)
+    assert list_sessions(db_path) == [1, 2]
+    path = tmp_path / "session_1.csv"
+    assert export_session(db_path, 1, path) == 7
+    with open(path, newline="") as fd:
+        header, *rows = list(csv.reader(fd, delimiter=";"))
+    assert tuple(header) == HEADERS
+    wave, seq = HEADERS.index("wavelength"), HEADERS.index("seq_number")
+    assert [(int(row[wave]), int(row[seq])) for row in rows] == [
+        (400, 3),
+        (400, 4),
+        (500, 0),
+        (500, 1),
+        (500, 2),
+        (500, 5),
+        (500, 6),
+    ]
+    assert not bins_filename(path).exists()
+
+
+def test_export_binned_session(tmp_path):
+    db_path = tmp_path / "spectess.db"
+    populate(db_path)
+    path = tmp_path / "session_2.csv"
+    assert export_session(db_path, 2, path) == 2
+    with open(bins_filename(path), newline="") as fd:
+        header, *rows = list(csv.reader(fd, delimiter=";"))
+    assert tuple(header) == BIN_HEADERS
+    assert len(rows) == 1
+    assert rows[0][BIN_HEADERS.index("count")] == "10"
+    assert rows[0][BIN_HEADERS.index("timestamp_last")] == str(T0 + timedelta(seconds=9))
+
+
+class View:
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def seqs(path):
+    with open(path, newline="") as fd:
+        header, *rows = list(csv.reader(fd, delimiter=";"))
+    return sorted(int(row[HEADERS.index("seq_number")]) for row in rows)
+
+
+def test_delta_export_does_not_advance_the_main_file(tmp_path):
+    db_path = tmp_path / "spectess.db"
+    populate(db_path)
+    engine = create_engine(f"sqlite:///{db_path}")
+
+    def add_samples(*seqs):
+        with Session(engine) as session, session.begin():
+            for seq in seqs:
+                r = reading(seq)
+                session.add(
+                    Sample(
+                        phot_id=1,
+                        role="TEST",
+                        session=1,
+                        filter="BG38",
+                        wave=600,
+                        tstamp=r["tstamp"],
+                        seq=seq,
+                        mag=r["mag"],
+                        freq=r["freq"],
+                        temp_box=r["tamb"],
+                    )
+                )
+
+    async def export(mode):
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        controller = Controller(
+            async_engine, async_sessionmaker(async_engine, expire_on_commit=False), photometer=1
+        )
+        controller.set_view(View())
+        controller._directory = PurePath(tmp_path)
+        controller._filename = PurePath("session_1.csv")
+        controller._selected_session = 1
+        controller._export_mode = mode
+        await controller.export_samples()
+        await async_engine.dispose()
+
+    asyncio.run(export("full"))
+    add_samples(10, 11)
+    asyncio.run(export("delta"))
+    add_samples(12)
+    asyncio.run(export("delta"))
+    asyncio.run(export("append"))
+    engine.dispose()
+    assert seqs(tmp_path / "session_1.csv") == [0, 1, 2, 3, 4, 5, 6, 10, 11, 12]
+    deltas = sorted(tmp_path.glob("session_1_delta_*.csv"))
+    assert [seqs(path) for path in deltas] == [[10, 11], [12]]
@@ -0,0 +1,48 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from spectess.join import asof_join
+
+Row = namedtuple("Row", ["wave", "tstamp", "name"])
+
+T0 = datetime(2024, 10, 18, 12, 0, 0)
+
+
+def rows(*items):
+    return [Row(wave, T0 + timedelta(seconds=t), name) for wave, t, name in items]
+
+
+async def aiterate(items):
+    for item in items:
+        yield item
+
+
+def join(left, right, **kwargs):
+    async def collect():
+        return [
+            (row.name, match.name if match else None)
+            async for row, match in asof_join(aiterate(left), aiterate(right), **kwargs)
+        ]
+
+    return asyncio.run(collect())
+
+
+def test_backward_within_tolerance_and_same_wave():
+    left = rows((400, 1.0, "t1"), (400, 3.0, "t2"), (500, 3.2, "t3"))
+    right = rows((400, 0.5, "r1"), (400, 1.5, "r2"), (500, 2.9, "r3"))
+    assert join(left, right) == [("t1", "r1"), ("t2", None), ("t3", "r3")]
+
+
+def test_nearest_picks_following_row():
+    left = rows((400, 1.0, "t1"))
+    right = rows((400, 0.2, "r1"), (400, 1.1, "r2"))
+    assert join(left, right, direction="nearest") == [("t1", "r2")]
+    assert join(left, right) == [("t1", "r1")]
@@ -0,0 +1,36 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from spectess.dbase.model import Model, Photometer, Sample, create_missing
+
+
+def table_names(conn):
+    return set(inspect(conn).get_table_names())
+
+
+def test_create_missing_upgrades_old_database(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+        async with engine.begin() as conn:
+            # A database created before the step, bin and watermark tables existed
+            await conn.run_sync(
+                Model.metadata.create_all, tables=[Photometer.__table__, Sample.__table__]
+            )
+        await create_missing(engine)
+        # Idempotent
+        await create_missing(engine)
+        async with engine.connect() as conn:
+            names = await conn.run_sync(table_names)
+        await engine.dispose()
+        return names
+
+    names = asyncio.run(run())
+    assert {"samples_t", "steps_t", "bins_t", "export_t", "config_t"} <= names
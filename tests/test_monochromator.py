@@ -0,0 +1,50 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+
+import pytest
+
+from spectess.monochromator import Monochromator, SerialMonochromator
+
+
+class Serial:
+    """Echoes each command line after a delay, and answers WAVE? queries"""
+
+    def __init__(self, delay=0.05):
+        self._delay = delay
+        self._lines = asyncio.Queue()
+        self.wavelength = 350
+
+    async def write_async(self, data):
+        line = data.decode("ascii").strip()
+        await self._lines.put(line)
+        if line == "WAVE?":
+            await self._lines.put(f"{self.wavelength:0.3f}")
+        elif line.startswith("GOWAVE"):
+            self.wavelength = int(line.split()[1])
+
+    async def readline_async(self):
+        await asyncio.sleep(self._delay)
+        return (await self._lines.get() + "\r\n").encode("ascii")
+
+
+def test_monochromator_is_abstract():
+    with pytest.raises(TypeError):
+        Monochromator()
+
+
+def test_cancelled_command_does_not_desynchronize():
+    async def run():
+        mono = SerialMonochromator("/dev/null")
+        mono._serial = Serial()
+        command = asyncio.create_task(mono._command("GOWAVE 500"))
+        await asyncio.sleep(0.01)
+        command.cancel()
+        await asyncio.gather(command, return_exceptions=True)
+        return await mono._query("WAVE?")
+
+    assert float(asyncio.run(run())) == 500
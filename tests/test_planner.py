@@ -0,0 +1,63 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+from collections import Counter
+
+from lica.asyncio.photometer import Role
+
+from spectess.planner import CostModel, PlanStep, estimate, plan
+from spectess.tui.controller import Controller
+
+
+def filter_of(wave):
+    return "BG38" if wave < 570 else "OG570"
+
+
+def test_best_plan_covers_all_steps_and_beats_naive():
+    waves = range(350, 1051, 50)
+    roles = ("REF", "TEST")
+    best, naive = plan(waves, roles, CostModel(10), filter_of)
+    expected = Counter((role, wave) for role in roles for wave in waves)
+    assert Counter((step.role, step.wavelength) for step in best) == expected
+    assert naive.name == "naive"
+    assert best.duration <= naive.duration
+    assert best.role_swaps <= naive.role_swaps
+
+
+def test_estimate():
+    cost = CostModel(10, reading_period=1.0, slew_rate=100.0, settle=0.5, overhead=0.5)
+    assert estimate([], cost) == 0.0
+    steps = [PlanStep("REF", 400, "BG38"), PlanStep("REF", 500, "BG38")]
+    # Two captures, one move of 100 nm plus settling and the final overhead
+    assert estimate(steps, cost) == 10 + 10 + 1.5 + 0.5
+
+
+class View:
+    """Records the calls made by the controller"""
+
+    def __init__(self):
+        self.calls = list()
+
+    def get_filter(self):
+        return "BG38"
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, *args))
+
+
+def test_role_change_requires_detecting_the_new_photometer():
+    controller = Controller(None, None, photometer=object())
+    view = View()
+    controller.set_view(view)
+    controller._cur_mac, controller._cur_phot_id = "AA:BB:CC:DD:EE:FF", 1
+    controller._apply_step(PlanStep(Role.TEST, 400, "BG38"))
+    assert controller._cur_phot_id == 1
+    assert ("disable_capture",) not in view.calls
+    controller._apply_step(PlanStep(Role.REF, 400, "BG38"))
+    assert controller.role is Role.REF
+    assert (controller._cur_mac, controller._cur_phot_id) == (None, None)
+    assert ("reset_switch",) in view.calls
+    assert ("disable_capture",) in view.calls
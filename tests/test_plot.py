@@ -0,0 +1,42 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+
+from textual.app import App
+from textual.widgets import Label, Sparkline
+
+from lica.asyncio.photometer import Role
+
+from spectess.tui.widgets.plot import FrequencyPlot
+
+
+class PlotApp(App):
+    def compose(self):
+        yield FrequencyPlot()
+
+
+def test_session_medians_per_role():
+    async def run():
+        app = PlotApp()
+        async with app.run_test():
+            plot = app.query_one(FrequencyPlot)
+            # As given by the controller, with the stored role tags
+            for wave, median in ((400, 10.0), (450, 12.0)):
+                plot.add_median(Role.REF.tag(), wave, median)
+            plot.add_median(Role.TEST.tag(), 400, 5.0)
+            plot._redraw()
+            return {
+                name: (
+                    list(plot.query_one(f"#session_plot_{name}", Sparkline).data),
+                    str(plot.query_one(f"#session_label_{name}", Label).renderable),
+                )
+                for name in ("ref", "test")
+            }
+
+    series = asyncio.run(run())
+    assert series["ref"] == ([10.0, 12.0], "Session REF: median vs λ [400 - 450 nm]")
+    assert series["test"] == ([5.0], "Session TEST: median vs λ [400 - 400 nm]")
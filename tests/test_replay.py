@@ -0,0 +1,208 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+import statistics
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from lica.asyncio.photometer import Role
+
+from spectess.ring import RingBuffer
+from spectess.dbase.model import Model, Photometer, Sample, Step
+from spectess.dbase.blob import pack_step
+from spectess.replay import ReplayPhotometer, dump_reading, load_readings
+from spectess.tui.controller import Controller
+
+T0 = datetime(2024, 10, 18, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def readings(n):
+    return [
+        {
+            "tstamp": T0 + timedelta(seconds=i),
+            "seq": i,
+            "freq": 100.0 + i % 7,
+            "mag": 15.0,
+            "tamb": 20.0,
+            "tsky": -10.0,
+        }
+        for i in range(n)
+    ]
+
+
+def write_stream(path, msgs):
+    with open(path, "w") as fd:
+        fd.writelines(dump_reading(msg) for msg in msgs)
+
+
+class View:
+    """Stands in for the Textual application, ignoring all display updates"""
+
+    def __init__(self):
+        self.medians = list()
+
+    def get_filter(self):
+        return "BG38"
+
+    def plot_median(self, role, wavelength, median):
+        self.medians.append((role, wavelength, median))
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def test_dump_load_round_trip(tmp_path):
+    msgs = readings(5)
+    path = tmp_path / "stream.jsonl"
+    write_stream(path, msgs)
+    assert load_readings(path) == msgs
+
+
+def test_receive_replayed_stream(tmp_path):
+    msgs = readings(30)
+    source, record = tmp_path / "stream.jsonl", tmp_path / "record.jsonl"
+    write_stream(source, msgs)
+    photometer = ReplayPhotometer(None, path=source, speed=0, restamp=False)
+    controller = Controller(None, None, photometer=photometer, record=record)
+    view = View()
+    controller.set_view(view)
+    controller._nsamples = 20
+    controller._wavelength = 450
+    controller.ring = RingBuffer(capacity=20)
+
+    asyncio.run(controller.receive())
+
+    # The step consumed exactly nsamples readings, recorded them as received
+    # and the producer stopped without a pending task
+    assert load_readings(record) == msgs[:20]
+    assert controller.producer.cancelled()
+    expected = statistics.median_low(msg["freq"] for msg in msgs[:20])
+    assert view.medians == [(controller.role.tag(), 450, expected)]
+
+
+def test_cancelled_receive_stops_producer(tmp_path):
+    msgs = readings(30)
+    source, record = tmp_path / "stream.jsonl", tmp_path / "record.jsonl"
+    write_stream(source, msgs)
+    # One reading every 10 ms
+    photometer = ReplayPhotometer(None, path=source, speed=100, restamp=False)
+    controller = Controller(None, None, photometer=photometer, record=record)
+    controller.set_view(View())
+    controller._nsamples = 20
+    controller.ring = RingBuffer(capacity=20)
+
+    async def run():
+        task = asyncio.create_task(controller.receive())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        return task
+
+    task = asyncio.run(run())
+    assert task.cancelled()
+    assert controller.producer.cancelled()
+    received = len(controller.ring)
+    assert 0 < received < 20
+    assert load_readings(record) == msgs[:received]
+
+
+def test_replay_ref_session_from_database(tmp_path):
+    db_path = tmp_path / "spectess.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    Model.metadata.create_all(engine)
+    msgs = [{**msg, "tstamp": msg["tstamp"].replace(tzinfo=None)} for msg in readings(6)]
+    with Session(engine) as session, session.begin():
+        phot = Photometer(
+            name="stars1",
+            mac="AA:BB:CC:DD:EE:FF",
+            sensor="TSL237",
+            model="TESS-W",
+            firmware="1.0",
+            zero_point=20.5,
+            freq_offset=0.0,
+        )
+        # Stored as captured, with the Role tags
+        common = dict(photometer=phot, role=Role.REF.tag(), session=1, wave=400, filter="BG38")
+        for msg in msgs[:3]:
+            session.add(
+                Sample(
+                    **common,
+                    tstamp=msg["tstamp"],
+                    seq=msg["seq"],
+                    mag=msg["mag"],
+                    freq=msg["freq"],
+                    temp_box=msg["tamb"],
+                )
+            )
+        session.add(Step(**common, **pack_step(msgs[3:])))
+    engine.dispose()
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        photometer = ReplayPhotometer(
+            async_sessionmaker(engine, expire_on_commit=False),
+            session_id=1,
+            role=Role.REF,
+            speed=0,
+            restamp=False,
+        )
+        info = await photometer.get_info()
+        producer = asyncio.create_task(photometer.readings())
+        replayed = [await photometer.queue.get() for _ in msgs]
+        await producer
+        await engine.dispose()
+        return info, replayed
+
+    info, replayed = asyncio.run(run())
+    assert info["name"] == "stars1"
+    assert [(msg["seq"], msg["freq"]) for msg in replayed] == [
+        (msg["seq"], msg["freq"]) for msg in msgs
+    ]
+
+
+class Monochromator:
+    """Notes whether the recorded stream was already written when the next move started"""
+
+    def __init__(self, record):
+        self._record = record
+        self.moves = list()
+
+    async def goto(self, wavelength):
+        pass
+
+    def move(self, wavelength):
+        self.moves.append((wavelength, self._record.exists()))
+
+
+def test_next_move_starts_before_the_step_cleanup(tmp_path):
+    msgs = readings(30)
+    source, record = tmp_path / "stream.jsonl", tmp_path / "record.jsonl"
+    write_stream(source, msgs)
+    photometer = ReplayPhotometer(None, path=source, speed=0, restamp=False)
+    monochromator = Monochromator(record)
+    controller = Controller(
+        None, None, photometer=photometer, record=record, monochromator=monochromator
+    )
+    controller.set_view(View())
+    controller._nsamples = 5
+    controller._wavelength = 450
+    controller._wave_incr = 10
+    controller._save = True
+    controller.ring = RingBuffer(capacity=5)
+
+    async def save_samples():
+        pass
+
+    controller.save_samples = save_samples
+    asyncio.run(controller.receive())
+    assert monochromator.moves == [(460, False)]
+    assert load_readings(record) == msgs[:5]
@@ -0,0 +1,82 @@
+# ----------------------------------------------------------------------
+# Copyright (c) 2024 Rafael Gonzalez.
+#
+# See the LICENSE file for details
+# ----------------------------------------------------------------------
+
+import asyncio
+
+import numpy as np
+
+from lica.asyncio.photometer import Role
+
+from spectess.store import DTYPE, SessionArchive, archived, write_archive
+from spectess.analysis import archive_response, spectral_response
+from spectess.tui.controller import Controller
+
+
+def records(waves, freqs):
+    array = np.zeros(len(waves), dtype=DTYPE)
+    array["wave"] = waves
+    array["freq"] = freqs
+    array["tstamp"] = np.arange(len(waves))[::-1]
+    return array
+
+
+def test_archive_round_trip(tmp_path):
+    arrays = {
+        Role.REF.tag(): records([500, 400, 500, 400], [20.0, 10.0, 20.0, 10.0]),
+        Role.TEST.tag(): records([400, 500, 400], [5.0, 20.0, 5.0]),
+    }
+    assert not archived(tmp_path, 7)
+    write_archive(tmp_path, 7, arrays)
+    assert archived(tmp_path, 7)
+    archive = SessionArchive(tmp_path, 7)
+    assert archive.waves(Role.REF) == (400, 500)
+    assert archive.select(Role.TEST, 500)["freq"].tolist() == [20.0]
+    assert archive.select(Role.REF, 600).size == 0
+    ref, test = arrays[Role.REF.tag()], arrays[Role.TEST.tag()]
+    expected = spectral_response((ref["wave"], ref["freq"]), (test["wave"], test["freq"]))
+    response = archive_response(archive)
+    for key in expected:
+        assert np.array_equal(response[key], expected[key])
+
+
+class Analyzer:
+    """Database side of the spectral response, with a settable watermark"""
+
+    def __init__(self, watermark):
+        self.current = watermark
+        self.computed = 0
+
+    async def watermark(self, session_id):
+        return self.current
+
+    async def compute(self, session_id):
+        self.computed += 1
+        empty = (np.empty(0, dtype=np.int64), np.empty(0))
+        return spectral_response(empty, empty)
+
+
+class View:
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def test_stale_archive_falls_back_to_database(tmp_path):
+    watermark = (4, 4, 0, None, 0, None)
+    arrays = {Role.REF.tag(): records([400], [10.0]), Role.TEST.tag(): records([400], [5.0])}
+    write_archive(tmp_path, 7, arrays, watermark)
+    assert SessionArchive(tmp_path, 7).watermark == watermark
+    controller = Controller(None, None, photometer=object())
+    controller.set_view(View())
+    controller.analyzer = Analyzer(watermark)
+    controller._directory = tmp_path
+    controller._selected_session = 7
+    asyncio.run(controller.compute_response())
+    assert controller.analyzer.computed == 0
+    assert controller._response["ratio"].tolist() == [0.5]
+    # A REF pass added after archiving
+    controller.analyzer.current = (6, 6, 0, None, 0, None)
+    asyncio.run(controller.compute_response())
+    assert controller.analyzer.computed == 1